@@ -0,0 +1,210 @@
+from array import array
+from collections import deque
+
+from pedigree_index import as_index
+
+
+class AncestorIndex:
+    """Memoized ancestor distances over a PedigreeIndex.
+
+    For every person the minimum generation distance to each ancestor within max_depth is
+    computed once from the already computed maps of the parents, so each person is expanded
+    only once no matter how many paths lead through it. The number of ancestor slots per
+    generation is counted alongside, which gives the pedigree collapse of a person.
+    """
+
+    def __init__(self, index, max_depth=16):
+        self.index = index
+        self.max_depth = max_depth
+        # person id -> {ancestor id: generation distance}
+        self._ancestors = {}
+        # person id -> number of ancestor paths per generation, up to max_depth
+        self._slots = {}
+
+    def ancestors(self, i):
+        if i not in self._ancestors:
+            self._compute(i)
+        return self._ancestors[i]
+
+    def _compute(self, i):
+        index = self.index
+        stack = [(i, False)]
+        in_progress = set()
+        while stack:
+            node, ready = stack.pop()
+            if node in self._ancestors:
+                continue
+            if not ready:
+                if node in in_progress:
+                    continue
+                in_progress.add(node)
+                stack.append((node, True))
+                for parent in index.parents(node):
+                    if parent not in self._ancestors and parent not in in_progress:
+                        stack.append((parent, False))
+                continue
+
+            distances = {}
+            slots = [0] * self.max_depth
+            for parent in index.parents(node):
+                # A parent still in progress is part of a cycle and contributes nothing.
+                if parent not in self._ancestors:
+                    continue
+                distances[parent] = 1
+                slots[0] += 1
+                for ancestor, distance in self._ancestors[parent].items():
+                    if distance < self.max_depth and distances.get(ancestor, distance + 1) > distance:
+                        distances[ancestor] = distance + 1
+                for generation, count in enumerate(self._slots[parent][:-1], 1):
+                    slots[generation] += count
+            self._ancestors[node] = distances
+            self._slots[node] = slots
+            in_progress.discard(node)
+
+    def forget(self, i):
+        # Drop the maps of i when nothing needs them anymore, they are computed again if asked
+        self._ancestors.pop(i, None)
+        self._slots.pop(i, None)
+
+    def nearest_common_ancestors(self, a, b):
+        """Common ancestors of a and b with the smallest total distance, as (id, da, db)."""
+        distances_a = dict(self.ancestors(a))
+        distances_a[a] = 0
+        distances_b = dict(self.ancestors(b))
+        distances_b[b] = 0
+        common = distances_a.keys() & distances_b.keys()
+        if not common:
+            return []
+        best = min(distances_a[x] + distances_b[x] for x in common)
+        return sorted((x, distances_a[x], distances_b[x]) for x in common
+                      if distances_a[x] + distances_b[x] == best)
+
+    def pedigree_collapse(self, i):
+        """1 - distinct ancestors / ancestor slots within max_depth, 0.0 without collapse."""
+        distinct = len(self.ancestors(i))
+        slots = sum(self._slots[i])
+        if not slots:
+            return 0.0
+        return 1.0 - distinct / slots
+
+
+def leaf_distances(index, persons=None, depth=None):
+    """Shortest distance from every person down to a descendant without children.
+
+    Returns (distances, next_hops): next_hops[i] is the child with the smallest id on a
+    shortest path, so the path can be followed down to the leaf. Persons with no reachable
+    leaf get -1 in both. With persons only their descendants within depth generations are
+    searched, which gives the same distances and paths for the persons whose leaf is at most
+    depth generations down.
+    """
+    n = len(index)
+    distances = array('i', [-1]) * n
+    next_hops = array('i', [-1]) * n
+    searched = None
+    if persons is not None:
+        searched = set(persons)
+        frontier = list(searched)
+        for _ in range(depth):
+            next_frontier = []
+            for i in frontier:
+                for child in index.children(i):
+                    if child not in searched:
+                        searched.add(child)
+                        next_frontier.append(child)
+            frontier = next_frontier
+    # Breadth first from all leaves at once, walking up the parent edges.
+    queue = deque(i for i in (range(n) if searched is None else sorted(searched))
+                  if not index.child_count(i))
+    for i in queue:
+        distances[i] = 0
+    while queue:
+        i = queue.popleft()
+        for parent in index.parents(i):
+            if searched is not None and parent not in searched:
+                continue
+            if distances[parent] == -1:
+                distances[parent] = distances[i] + 1
+                next_hops[parent] = i
+                queue.append(parent)
+            elif distances[parent] == distances[i] + 1 and i < next_hops[parent]:
+                next_hops[parent] = i
+    return distances, next_hops
+
+
+def path_to_leaf(next_hops, i):
+    path = [i]
+    while next_hops[path[-1]] != -1:
+        path.append(next_hops[path[-1]])
+    return path
+
+
+def distinct_parents(index, i):
+    parents = []
+    for parent in index.parents(i):
+        if parent not in parents:
+            parents.append(parent)
+    return parents
+
+
+def ancestors_at(index, i, generations):
+    """{ancestor: path from i up to it} for the ancestors exactly generations parent links up.
+
+    An ancestor counts when any path up from i is that long, not only the shortest one.
+    """
+    paths = {i: [i]}
+    for _ in range(generations):
+        paths = {parent: path + [parent] for x, path in paths.items()
+                 for parent in index.parents(x)}
+    return paths
+
+
+def describe_cousins(distance_a, distance_b):
+    if min(distance_a, distance_b) == 0:
+        return f'direct line, {max(distance_a, distance_b)} generations apart'
+    degree = min(distance_a, distance_b) - 1
+    removed = abs(distance_a - distance_b)
+    description = 'siblings' if degree == 0 else f'{degree}. cousins'
+    if removed:
+        description += f' {removed}x removed'
+    return description
+
+
+def find_related_parents(graph, max_depth=10, ancestry=None):
+    """Report persons whose parents share ancestors within max_depth generations.
+
+    Returns a list of (child name, pedigree collapse, [(ancestor name, distance from first
+    parent, distance from second parent)]) for the nearest common ancestors of the parents.
+    The ancestor maps of a person are dropped once the person and all of its children have
+    been handled, so only the maps of the generations in progress are held at a time.
+    """
+    index = as_index(graph)
+    ancestry = ancestry or AncestorIndex(index, max_depth)
+    # Handled persons and children each person still waits for, one per parent link
+    waiting = array('i', (index.child_count(i) + 1 for i in range(len(index))))
+    found = []
+    for i in range(len(index)):
+        parents = distinct_parents(index, i)
+        nearest = ancestry.nearest_common_ancestors(*parents) if len(parents) == 2 else []
+        if nearest:
+            report_related_parents(index, ancestry, i, nearest, found)
+        elif index.child_count(i):
+            # Computed while the parents are still held, for the children to come
+            ancestry.ancestors(i)
+        for x in [i, *index.parents(i)]:
+            waiting[x] -= 1
+            if not waiting[x]:
+                ancestry.forget(x)
+    return found
+
+
+def report_related_parents(index, ancestry, i, nearest, found):
+    _, distance_a, distance_b = nearest[0]
+    collapse = ancestry.pedigree_collapse(i)
+    name_cleaned = index.names[i].split('\n')[0]
+    print(f'Parents of {name_cleaned} are {describe_cousins(distance_a, distance_b)}, '
+          f'pedigree collapse {collapse:.3f}')
+    for ancestor, _, _ in nearest:
+        print('              Common ancestor: ' +
+              index.names[ancestor].replace('\n', ' ').strip())
+    found.append((index.names[i], collapse,
+                  [(index.names[x], da, db) for x, da, db in nearest]))
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sgraph import SGraph
+from sgraph.converters.graphml import sgraph_to_graphml_file
+
+from ancestry import find_related_parents
+from graph_cache import load_index_cache, write_index_cache
+from graphml_stream import graphml_file_to_sgraph
+from parallel_verify import run_check
+from pedigree_index import PedigreeIndex
+from synthetic import generate_pedigree
+from verifier import find_cousin_marriages, verification_checks
+
+
+def timed(step, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return step, time.perf_counter() - start, None, result
+
+
+def benchmark_size(persons, seed=0, roundtrip=True, cousin_levels=4, **generator_options):
+    """Time generation, every verification check and the file round trips for one size.
+
+    Returns (step, seconds, error) rows. Check output is captured and dropped.
+    """
+    rows = []
+
+    def add(row):
+        rows.append(row[:3])
+        return row[3]
+
+    graph = add(timed('generate', lambda: generate_pedigree(persons, seed, **generator_options)))
+    index = add(timed('build index', PedigreeIndex.from_sgraph, graph))
+
+    for name, check, args in verification_checks():
+        r = run_check(index, name, check, args)
+        rows.append((name, r.wall_time, None if r.error is None else str(r.error)))
+
+    for level in range(1, cousin_levels + 1):
+        r = run_check(index, f'find_cousin_marriages level {level}', find_cousin_marriages,
+                      (level,))
+        rows.append((r.name, r.wall_time, None if r.error is None else str(r.error)))
+    r = run_check(index, 'find_related_parents', find_related_parents, ())
+    rows.append((r.name, r.wall_time, None if r.error is None else str(r.error)))
+
+    if roundtrip:
+        with tempfile.TemporaryDirectory() as tmp:
+            graphml = os.path.join(tmp, 'synthetic.graphml')
+            xml = os.path.join(tmp, 'synthetic.xml')
+            cache = os.path.join(tmp, 'synthetic.bin')
+            add(timed('write graphml', sgraph_to_graphml_file, graph, graphml))
+            parsed = add(timed('read graphml (streaming)', graphml_file_to_sgraph, graphml))
+            add(timed('write sgraph xml', parsed.to_xml, xml, False))
+            add(timed('read sgraph xml', SGraph.parse_xml, xml))
+            add(timed('write graph cache', write_index_cache, index, cache))
+            add(timed('read graph cache', load_index_cache, cache))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the verifier and the converter on '
+                                                 'synthetic family trees.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pedigree-collapse', type=float, default=0.05)
+    parser.add_argument('--name-collisions', type=float, default=0.01)
+    parser.add_argument('--missing-parents', type=float, default=0.1)
+    parser.add_argument('--descriptions', type=float, default=0.05)
+    parser.add_argument('--no-roundtrip', action='store_true',
+                        help='skip writing and reading the GraphML, XML and cache files')
+    parser.add_argument('--json', help='also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for persons in args.sizes:
+        rows = benchmark_size(persons, args.seed, not args.no_roundtrip,
+                              pedigree_collapse=args.pedigree_collapse,
+                              name_collisions=args.name_collisions,
+                              missing_parents=args.missing_parents,
+                              descriptions=args.descriptions)
+        for step, seconds, error in rows:
+            status = '' if error is None else '  FAILED: ' + error.split('\n')[0]
+            print(f'{persons:>9} {step:<56} {seconds:9.3f} s{status}')
+            sys.stdout.flush()
+            results.append({'persons': persons, 'step': step, 'seconds': seconds,
+                            'error': error})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
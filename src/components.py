@@ -0,0 +1,109 @@
+from array import array
+
+from except_utils import report_issue
+from instrument import count
+from pedigree_index import as_index
+
+# Components this small next to a bigger tree are likely cut off by a broken link
+SMALL_FRAGMENT_SIZE = 5
+
+
+def component_labels(graph):
+    """Component number of every person, from one union-find pass over the parent edges.
+
+    Components are numbered in the order of their first person.
+    """
+    index = as_index(graph)
+    root = array('i', range(len(index)))
+
+    def find(i):
+        while root[i] != i:
+            # Path halving keeps the trees flat
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    for i in range(len(index)):
+        for parent in index.parents(i):
+            a, b = find(i), find(parent)
+            if a != b:
+                # The smaller id as the root numbers components by their first person
+                if a < b:
+                    root[b] = a
+                else:
+                    root[a] = b
+    count('edges traversed', len(index.parent_ids))
+
+    labels = array('i', bytes(4 * len(index)))
+    numbers = {}
+    for i in range(len(index)):
+        labels[i] = numbers.setdefault(find(i), len(numbers))
+    return labels
+
+
+def component_members(graph, labels=None):
+    # Person ids of each component, in component order
+    labels = labels or component_labels(graph)
+    members = []
+    for i, label in enumerate(labels):
+        if label == len(members):
+            members.append([])
+        members[label].append(i)
+    return members
+
+
+def components(graph, min_size=1):
+    """(person ids, PedigreeIndex) of each connected component, to be processed on its own.
+
+    Person k of the component index is ids[k] of the whole graph.
+    """
+    index = as_index(graph)
+    for ids in component_members(index):
+        if len(ids) >= min_size:
+            yield ids, index.subset(ids)
+
+
+def size_bucket(size):
+    # 1, 2-5, 6-10, 11-100, 101-1000, ...
+    if size <= SMALL_FRAGMENT_SIZE:
+        return (1, 1) if size == 1 else (2, SMALL_FRAGMENT_SIZE)
+    low, high = SMALL_FRAGMENT_SIZE + 1, 10
+    while size > high:
+        low, high = high + 1, high * 10
+    return low, high
+
+
+def verify_components(graph, small_fragment_size=SMALL_FRAGMENT_SIZE):
+    """Report the component size distribution, isolated persons and small fragments."""
+    index = as_index(graph)
+    members = component_members(index)
+    if not members:
+        return members
+
+    distribution = {}
+    for ids in members:
+        bucket = size_bucket(len(ids))
+        distribution[bucket] = distribution.get(bucket, 0) + 1
+    largest = max(len(ids) for ids in members)
+    print(f'{len(members)} connected components, the largest has {largest} persons')
+    for (low, high), components_of_size in sorted(distribution.items()):
+        sizes = str(low) if low == high else f'{low}-{high}'
+        print(f'    size {sizes:>12}: {components_of_size}')
+
+    if len(members) == 1:
+        return members
+    isolated = [ids[0] for ids in members if len(ids) == 1]
+    if isolated:
+        print(f'Isolated persons without parents or children: {len(isolated)}')
+        for i in isolated:
+            print(f'    {index.names[i]}')
+            report_issue('verify_components', f'Isolated person: {index.names[i]}', [i],
+                         'warning')
+    for ids in members:
+        if 1 < len(ids) <= small_fragment_size and len(ids) < largest:
+            print(f'Small detached fragment of {len(ids)} persons:')
+            for i in ids:
+                print(f'    {index.names[i]}')
+            report_issue('verify_components', f'Small detached fragment of {len(ids)} persons: '
+                         f'{index.names[ids[0]]}', ids, 'warning')
+    return members
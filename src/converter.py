@@ -1,10 +1,22 @@
+import argparse
+import contextlib
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from sgraph import SGraph
-from sgraph.converters.graphml import graphml_to_sgraph
 from sgraph.converters.graphml import sgraph_to_graphml_file
 
-from verifier import verify_graph
+from except_utils import collecting_issues
+from gedcom import index_to_sgraph, read_gedcom, write_gedcom
+from graph_cache import file_digest, load_index_cached, parse_graph_file
+from graphml_stream import graphml_file_to_sgraph
+from incremental import save_snapshot, verify_graph_incremental
+from instrument import instrumenting, instrumenting_to, timed
+from parallel_verify import verify_graph_sharded
+from verifier import report_related_persons, verify_graph
 
 
 def replace_double_quotes(g):
@@ -19,11 +31,18 @@ def replace_double_quotes(g):
             stack.extend(elem.children)
 
 
-def convert_from_a_to_b(a, b):
-    if 'graphml' in a:
-        with open(a) as f:
-            s = f.read()
-            g = graphml_to_sgraph(s)
+def convert_from_a_to_b(a, b, quiet=False):
+    if b.endswith('.ged'):
+        write_gedcom(parse_graph_file(a), b)
+    elif a.endswith('.ged'):
+        graph = index_to_sgraph(read_gedcom(a))
+        if 'graphml' in b:
+            sgraph_to_graphml_file(graph, b)
+        else:
+            graph.to_xml(fname=b)
+    elif 'graphml' in a:
+        g = graphml_file_to_sgraph(a)
+        if not quiet:
             names = []
             for e in g.rootNode.children:
                 for n in e.children:
@@ -35,18 +54,226 @@ def convert_from_a_to_b(a, b):
             for n in names:
                 print(n)
 
-            # Use only if you need to:
-            ## replace_double_quotes(g)
+        # Use only if you need to:
+        ## replace_double_quotes(g)
 
-            g.to_xml(fname=b)
+        g.to_xml(fname=b)
     elif 'graphml' in b:
         sgraph_to_graphml_file(SGraph.parse_xml(a), b)
     else:
         raise Exception('Unknown input files, graphml not in ... ' + a + ' ' + b)
 
 
+def output_name(a, out_dir):
+    # GraphML and GEDCOM inputs become sgraph XML and everything else GraphML
+    base = os.path.splitext(os.path.basename(a))[0]
+    return os.path.join(out_dir, base + ('.xml' if 'graphml' in a or a.endswith('.ged')
+                                         else '.graphml'))
+
+
+def batch_jobs(source, out_dir):
+    """(input, output) pairs of a directory of graph files or of a manifest file.
+
+    A manifest has one input per line, optionally followed by a tab and the output. Relative
+    paths are relative to the manifest, and lines starting with # are skipped. Two inputs
+    with the same output, like a.graphml and a.ged, are rejected.
+    """
+    if os.path.isdir(source):
+        jobs = [(os.path.join(source, f), output_name(f, out_dir))
+                for f in sorted(os.listdir(source)) if f.endswith(('.graphml', '.xml', '.ged'))]
+    else:
+        jobs = []
+        base = os.path.dirname(source)
+        with open(source, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                a = os.path.join(base, fields[0].strip())
+                b = os.path.join(base, fields[1].strip()) if len(fields) > 1 and \
+                    fields[1].strip() else output_name(a, out_dir)
+                jobs.append((a, b))
+
+    inputs = {}
+    for a, b in jobs:
+        inputs.setdefault(os.path.normpath(b), []).append(a)
+    clashes = [f'{b} from {", ".join(a)}' for b, a in inputs.items() if len(a) > 1]
+    if clashes:
+        raise Exception('Several inputs have the same output: ' + '; '.join(clashes))
+    return jobs
+
+
+def convert_and_verify(a, b, digest=None, no_cache=False, instrument=False,
+                       trace_memory=False):
+    """Convert a to b and verify b, collecting all issues instead of stopping at the first.
+
+    The printed output goes to b's .log file and the issues to its .issues.jsonl file next to
+    it. Returns a summary of the job, with instrument also the timers and counters of the run.
+    """
+    start = time.perf_counter()
+    stem = os.path.splitext(b)[0]
+    result = {'input': a, 'output': b, 'digest': digest or file_digest(a), 'status': 'ok',
+              'issues': 0, 'errors': 0, 'message': None}
+    with open(stem + '.log', 'w', encoding='utf-8') as log, \
+            open(stem + '.issues.jsonl', 'w', encoding='utf-8') as issues, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log), \
+            instrumenting(trace_memory) if instrument else contextlib.nullcontext() as \
+            instrumentation:
+        try:
+            with timed('convert'):
+                convert_from_a_to_b(a, b, quiet=True)
+            with timed('load'):
+                graph = parse_graph_file(b) if no_cache else load_index_cached(b)
+            with collecting_issues(issues) as collector:
+                verify_graph(graph)
+            result['issues'] = len(collector.issues)
+            result['errors'] = len(collector.errors())
+            if result['errors']:
+                result['status'] = 'errors'
+        except Exception as e:
+            result['status'] = 'failed'
+            result['message'] = str(e)
+        if instrumentation is not None:
+            result['instrumentation'] = instrumentation.summary()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def convert_batch(jobs, state_path, workers=None, no_cache=False, force=False,
+                  instrument=False, trace_memory=False):
+    """Run convert_and_verify for (input, output) jobs in a process pool.
+
+    The input digests and results are kept in the JSON file state_path. Jobs whose input and
+    output are the same as in the previous run, and which did not fail then, are skipped and
+    their previous result is reported. Returns the results in the order of jobs.
+    """
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+
+    results = [None] * len(jobs)
+    pending = {}
+    for k, (a, b) in enumerate(jobs):
+        digest = file_digest(a)
+        previous = state.get(a)
+        if not force and previous and previous['digest'] == digest and \
+                previous['output'] == b and previous['status'] != 'failed' and os.path.exists(b):
+            results[k] = dict(previous, skipped=True)
+        else:
+            pending[k] = digest
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(convert_and_verify, *jobs[k], digest, no_cache, instrument,
+                               trace_memory): k
+                   for k, digest in pending.items()}
+        for future in as_completed(futures):
+            k = futures[future]
+            results[k] = dict(future.result(), skipped=False)
+            state[jobs[k][0]] = {key: value for key, value in results[k].items()
+                                 if key != 'skipped'}
+
+    # Written next to the target and renamed, so an interrupted run keeps the old state
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, ensure_ascii=False)
+    os.replace(state_path + '.tmp', state_path)
+    return results
+
+
+def write_batch_summary(results, out=sys.stdout):
+    counts = {}
+    for r in results:
+        status = 'skipped' if r['skipped'] else r['status']
+        counts[status] = counts.get(status, 0) + 1
+        seconds = '' if r['skipped'] else f'{r["seconds"]:8.2f} s'
+        out.write(f'{status:8} {r["issues"]:6} issues {r["errors"]:6} errors {seconds:>10}  '
+                  f'{r["input"]}\n')
+        if r['message']:
+            out.write(f'         {r["message"]}\n')
+    out.write(', '.join(f'{count} {status}' for status, count in sorted(counts.items())) + '\n')
+
+
 if __name__ == '__main__':
-    convert_from_a_to_b(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(description='Convert between GraphML, GEDCOM and sgraph '
+                                                 'XML and verify the result.')
+    parser.add_argument('a', help='input file, or with --batch a directory or manifest file')
+    parser.add_argument('b', help='output file, or with --batch the output directory')
+    parser.add_argument('--quiet', action='store_true',
+                        help='do not print the names of all converted persons')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always parse the output again instead of using the graph cache')
+    parser.add_argument('--issues', metavar='FILE',
+                        help='collect all issues instead of stopping at the first error and '
+                             'write them to FILE as JSON Lines, - for stdout with the rest of '
+                             'the output on stderr')
+    parser.add_argument('--verbose', action='store_true',
+                        help='also print the cousin marriages and the pedigree collapse of '
+                             'persons whose parents are related')
+    parser.add_argument('--workers', type=int,
+                        help='verify the connected components in this many processes, with '
+                             '--batch the number of files converted at the same time')
+    parser.add_argument('--batch', action='store_true',
+                        help='convert and verify every graph file of a directory or manifest, '
+                             'skipping inputs unchanged since the previous batch')
+    parser.add_argument('--state', metavar='FILE',
+                        help='batch state file, by default .convert_state.json in the output '
+                             'directory')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write the batch results to FILE as JSON')
+    parser.add_argument('--force', action='store_true',
+                        help='convert all batch inputs, also the unchanged ones')
+    parser.add_argument('--instrument', metavar='FILE', default=os.getenv('VERIFY_INSTRUMENT'),
+                        help='write the time of each step and check and the work counters '
+                             'to FILE as JSON, - for stderr, with --batch into the report')
+    parser.add_argument('--trace-memory', action='store_true',
+                        default=os.getenv('VERIFY_INSTRUMENT_MEMORY', '') not in ('', '0'),
+                        help='also record the peak memory of each step with tracemalloc')
+    args = parser.parse_args()
+
+    if args.batch:
+        os.makedirs(args.b, exist_ok=True)
+        results = convert_batch(batch_jobs(args.a, args.b),
+                                args.state or os.path.join(args.b, '.convert_state.json'),
+                                args.workers, args.no_cache, args.force,
+                                bool(args.instrument), args.trace_memory)
+        write_batch_summary(results)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=1, ensure_ascii=False)
+        sys.exit(1 if any(r['status'] != 'ok' for r in results) else 0)
+
+    # With the issues streamed to stdout everything else printed goes to stderr
+    issues_stdout = sys.stdout
+    if args.issues == '-':
+        sys.stdout = sys.stderr
+    with instrumenting_to(args.instrument, args.trace_memory):
+        with timed('convert'):
+            convert_from_a_to_b(args.a, args.b, args.quiet)
 
-    graph2 = SGraph.parse_xml(sys.argv[2])
-    verify_graph(graph2)
+        with timed('load'):
+            if args.no_cache:
+                graph2 = parse_graph_file(args.b)
+            else:
+                # Unchanged output is verified from the cached index without parsing it again.
+                graph2 = load_index_cached(args.b)
+        # With VERIFY_SNAPSHOT set, only the persons changed since the last run are reverified.
+        snapshot = os.getenv('VERIFY_SNAPSHOT')
+        with contextlib.ExitStack() as stack:
+            if args.issues:
+                stream = issues_stdout if args.issues == '-' else \
+                    stack.enter_context(open(args.issues, 'w', encoding='utf-8'))
+                collector = stack.enter_context(collecting_issues(stream))
+            stack.enter_context(timed('verify'))
+            if snapshot and os.path.exists(snapshot):
+                verify_graph_incremental(snapshot, graph2)
+            elif args.workers:
+                verify_graph_sharded(graph2, workers=args.workers)
+            else:
+                verify_graph(graph2)
+            # Once, whichever way the graph was verified
+            if args.verbose:
+                report_related_persons(graph2)
+        if args.issues:
+            collector.raise_errors()
+        if snapshot:
+            save_snapshot(graph2, snapshot)
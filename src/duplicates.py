@@ -0,0 +1,276 @@
+import functools
+import re
+
+from except_utils import report_issue
+from instrument import count
+from life_years import parse_life_years, person_life_years, yb_pat
+from pedigree_index import as_index
+from rules import selected_persons
+
+# Spellings of the same first name, the first one is used for all of them
+NAME_VARIANTS = [
+    ['johan', 'juho', 'juhana', 'johannes', 'jussi', 'hans'],
+    ['gustaf', 'kustaa', 'kusti', 'gustav'],
+    ['jakob', 'jaakko', 'jaakob'],
+    ['mattias', 'matti', 'matts', 'mats', 'matias'],
+    ['anders', 'antti', 'andreas'],
+    ['henrik', 'heikki', 'henrikki'],
+    ['erik', 'erkki', 'eerikki'],
+    ['petter', 'pekka', 'pietari', 'per', 'peter'],
+    ['mikael', 'mikko', 'mikkel'],
+    ['israel', 'iisakki', 'isak'],
+    ['maria', 'maija', 'marja', 'mari'],
+    ['elisabet', 'liisa', 'lisa', 'elisabeth', 'lisbeta', 'liisu'],
+    ['katarina', 'kaisa', 'karin', 'katri', 'kaarina'],
+    ['birgitta', 'brita', 'priita', 'riitta'],
+    ['valborg', 'valpuri', 'walborg'],
+    ['helena', 'leena', 'lena', 'elin'],
+    ['margareta', 'marketta', 'greta', 'reetta'],
+]
+# Patronymic endings in Finnish and Swedish, most specific first
+PATRONYMIC_SUFFIXES = [('npoika', 'son'), ('poika', 'son'), ('sson', 'son'), ('son', 'son'),
+                       ('ntytär', 'dotter'), ('tytär', 'dotter'), ('sdotter', 'dotter'),
+                       ('dotter', 'dotter')]
+LETTERS = str.maketrans({'ä': 'a', 'å': 'o', 'ö': 'o', 'é': 'e', 'ü': 'y', 'w': 'v', 'z': 's',
+                         'c': 'k', 'q': 'k', 'x': 'ks'})
+SPELLINGS = [('ph', 'f'), ('th', 't'), ('dt', 't'), ('ck', 'k'), ('kh', 'k'), ('ij', 'i'),
+             ('y', 'i'), ('j', 'i')]
+double_letter_pat = re.compile(r'(.)\1+')
+word_pat = re.compile(r'[^\W\d_]+')
+
+# Blocks with more persons than this are too common to tell anything and are skipped, which
+# keeps the number of compared pairs linear in the number of persons
+MAX_BLOCK_SIZE = 64
+# Birth years of duplicates may differ this much, more when a year is approximate
+YEAR_TOLERANCE = 2
+MIN_SCORE = 0.75
+
+
+def respell(word):
+    word = word.lower().translate(LETTERS)
+    for a, b in SPELLINGS:
+        word = word.replace(a, b)
+    return word
+
+
+def spelling_key(word):
+    return double_letter_pat.sub(r'\1', respell(word))
+
+
+CANONICAL_NAMES = {spelling_key(v): spelling_key(names[0]) for names in NAME_VARIANTS
+                   for v in names}
+# Endings with and without their double letters, Mattsdoter is spelled both ways
+SUFFIX_KEYS = list(dict.fromkeys((key(suffix), replacement)
+                                 for suffix, replacement in PATRONYMIC_SUFFIXES
+                                 for key in (respell, spelling_key)))
+
+
+@functools.lru_cache(maxsize=None)
+def phonetic_key(word):
+    """Key shared by spelling variants of a name, patronymics included.
+
+    Juhonpoika and Johansson get the same key, as do Mattsson and Matinpoika or
+    Mattsdotter and Matintytär.
+    """
+    word = respell(word)
+    collapsed = double_letter_pat.sub(r'\1', word)
+    # Endings are stripped before double letters are collapsed, so Mattsson is Matts + son
+    # and not Mat + son. Of the matching endings prefer one that leaves a known first name,
+    # Mattsdotter is Matts + dotter while Juhonpoika is Juho + npoika.
+    stems = [(double_letter_pat.sub(r'\1', w[:-len(suffix)]), replacement)
+             for w in dict.fromkeys((word, collapsed)) for suffix, replacement in SUFFIX_KEYS
+             if w.endswith(suffix) and len(w) > len(suffix) + 1]
+    for stem, ending in stems:
+        if stem in CANONICAL_NAMES:
+            return CANONICAL_NAMES[stem] + ending
+    if stems:
+        return stems[0][0] + stems[0][1]
+    return CANONICAL_NAMES.get(collapsed, collapsed)
+
+
+def name_part(name):
+    # The first line up to the year of birth, or all of it when there is no year
+    first_line = name.split('\n', 1)[0]
+    m = yb_pat.search(first_line)
+    return first_line[:m.start() + 1] if m else first_line
+
+
+def name_keys(name):
+    return [phonetic_key(w) for w in word_pat.findall(name_part(name))]
+
+
+def block_keys(keys):
+    # The whole name, and with three or more words also the name without each one of them
+    # so that a missing or added patronymic still lands in the same block
+    yield tuple(keys)
+    if len(keys) > 2:
+        for skipped in range(len(keys)):
+            yield tuple(keys[:skipped] + keys[skipped + 1:])
+
+
+def trigrams(keys):
+    text = ' ' + ' '.join(keys) + ' '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def person_blocks(name, birth):
+    # (block key, birth year) blocks of one person, none without a birth year
+    return [(key, birth) for key in block_keys(name_keys(name))] if birth else []
+
+
+def duplicate_blocks(graph, years=None):
+    """({(block key, birth year): person ids}, blocks of each person) of the whole index.
+
+    Built once and kept with the index, and with a snapshot of it, so that an incremental
+    run only updates the blocks of the renamed persons.
+    """
+    index = as_index(graph)
+    if getattr(index, '_duplicate_blocks', None) is None:
+        years = years or parse_life_years(index)
+        blocks = {}
+        blocks_of = [person_blocks(name, birth)
+                     for name, birth in zip(index.names, years.birth.tolist())]
+        for i, person in enumerate(blocks_of):
+            for block in person:
+                blocks.setdefault(block, []).append(i)
+        index._duplicate_blocks = blocks, blocks_of
+    return index._duplicate_blocks
+
+
+def carry_over_duplicate_blocks(previous, index, renamed):
+    """Give index the blocks of previous, updated for the renamed ids.
+
+    Every other id must have the same name in both indexes, see
+    PedigreeIndex.carry_over_lookups.
+    """
+    if getattr(previous, '_duplicate_blocks', None) is None or \
+            index._duplicate_blocks is not None:
+        return
+    blocks, old_blocks_of = previous._duplicate_blocks
+    blocks = dict(blocks)
+    blocks_of = old_blocks_of[:len(index)] + [[] for _ in range(len(index) - len(old_blocks_of))]
+    for i in renamed:
+        for block in old_blocks_of[i] if i < len(old_blocks_of) else ():
+            ids = [x for x in blocks[block] if x != i]
+            if ids:
+                blocks[block] = ids
+            else:
+                del blocks[block]
+        if i < len(index):
+            birth = person_life_years(index.names[i], index.attrs[i])[0][0]
+            blocks_of[i] = person_blocks(index.names[i], birth)
+            for block in blocks_of[i]:
+                blocks[block] = blocks.get(block, []) + [i]
+    index._duplicate_blocks = blocks, blocks_of
+
+
+def year_tolerance(years, i):
+    return YEAR_TOLERANCE + (YEAR_TOLERANCE * 5 if years.birth_approximate[i] else 0)
+
+
+def block_mates(blocks, i, years):
+    # Persons sharing a block with i, or a block of the same key within the year tolerance
+    blocks, blocks_of = blocks
+    birth = int(years.birth[i])
+    tolerance = year_tolerance(years, i)
+    mates = set()
+    for key, _ in blocks_of[i]:
+        for year in range(birth - tolerance, birth + tolerance + 1):
+            block = blocks.get((key, year), ())
+            if len(block) <= MAX_BLOCK_SIZE:
+                mates.update(block)
+    mates.discard(i)
+    return mates
+
+
+def find_duplicate_candidates(graph, persons=None, min_score=MIN_SCORE, years=None):
+    """Ranked (score, i, j) pairs of persons that may be the same person.
+
+    Persons are blocked by the phonetic keys of the words of the name together with the
+    birth year, so only persons with the same name up to spelling variants, patronymics
+    and one added word, born within YEAR_TOLERANCE years of each other, are compared. The
+    score combines name trigram similarity, the distance of birth and death years and the
+    similarity of the parents and children. With persons only the names and years of the
+    persons, their block mates and their relatives are parsed.
+    """
+    index = as_index(graph)
+    if persons is None:
+        years = years or parse_life_years(index)
+    blocks = duplicate_blocks(index, years)
+    if years is None:
+        # The years of the persons pick their blocks, those of the block mates score them
+        years = parse_life_years(index, persons)
+        mates = {j for i in persons for j in block_mates(blocks, i, years)}
+        years = parse_life_years(index, mates.union(persons))
+    birth = years.birth.tolist()
+    death = years.death.tolist()
+
+    key_cache = {}
+    gram_cache = {}
+
+    def keys(i):
+        if i not in key_cache:
+            key_cache[i] = name_keys(index.names[i])
+        return key_cache[i]
+
+    def grams(i):
+        if i not in gram_cache:
+            gram_cache[i] = trigrams(keys(i))
+        return gram_cache[i]
+
+    def relatives(i):
+        # Parents and children by id and by the phonetic key of their names
+        ids = set(index.parents(i)) | set(index.children(i))
+        return ids, {' '.join(keys(x)) for x in ids}
+
+    scored = {}
+    compared = 0
+    for i in selected_persons(index, persons):
+        if not birth[i]:
+            continue
+        tolerance = year_tolerance(years, i)
+        candidates = block_mates(blocks, i, years)
+        ids_i, names_i = relatives(i)
+        for j in candidates:
+            pair = (i, j) if i < j else (j, i)
+            if pair in scored:
+                continue
+            compared += 1
+            name_score = jaccard(grams(i), grams(j))
+            if name_score < 0.5:
+                continue
+            year_score = 1 - abs(birth[i] - birth[j]) / (tolerance + 1)
+            if death[i] and death[j]:
+                year_score = (year_score + (1.0 if abs(death[i] - death[j]) <= tolerance
+                                            else 0.0)) / 2
+            ids_j, names_j = relatives(j)
+            if ids_i & ids_j:
+                family_score = 1.0
+            elif names_i and names_j:
+                family_score = jaccard(names_i, names_j)
+            else:
+                # Nothing to compare, neither for nor against
+                family_score = 0.5
+            scored[pair] = 0.5 * name_score + 0.2 * year_score + 0.3 * family_score
+
+    count('pairs compared', compared)
+    ranked = [(score, i, j) for (i, j), score in scored.items() if score >= min_score]
+    ranked.sort(key=lambda x: (-x[0], x[1], x[2]))
+    return ranked
+
+
+def report_duplicate_candidates(graph, persons=None, min_score=MIN_SCORE):
+    index = as_index(graph)
+    ranked = find_duplicate_candidates(index, persons, min_score)
+    if ranked:
+        print('\nPossible duplicate persons, most likely first')
+    for score, i, j in ranked:
+        print(f'  {score:.2f}  <{index.names[i]}>\n        <{index.names[j]}>')
+        report_issue('report_duplicate_candidates',
+                     f'Possible duplicate persons ({score:.2f}): {index.names[i]} --- '
+                     f'{index.names[j]}', [i, j], 'warning')
+    return ranked
@@ -1,5 +1,12 @@
+import contextlib
+import json
 import os
 import sys
+from collections import namedtuple
+
+# One finding of a check. severity is 'error', 'warning' or 'info' and persons holds the
+# ids of the persons involved in the PedigreeIndex the check ran on.
+Issue = namedtuple('Issue', 'check severity persons message')
 
 
 class VErr(Exception):
@@ -10,6 +17,10 @@ class VErr(Exception):
         # Now for your custom code...
         self.errors = errors
 
+    def __reduce__(self):
+        # Keeps the errors when passed between processes
+        return VErr, (str(self), self.errors)
+
 
 
 def conditional_raise(e):
@@ -21,3 +32,55 @@ def conditional_raise(e):
     else:
         pass  # sys.stderr.write('Could have raised an exception, but RAISE_EXCEPTION prevented.')  # raise Exception(msg)
 
+
+class IssueCollector:
+    """Keeps the issues reported while it is active, optionally writing them as JSON Lines."""
+
+    def __init__(self, stream=None):
+        self.issues = []
+        self.stream = stream
+
+    def add(self, issue):
+        self.issues.append(issue)
+        if self.stream is not None:
+            self.stream.write(json.dumps(issue._asdict(), ensure_ascii=False) + '\n')
+            self.stream.flush()
+
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == 'error']
+
+    def raise_errors(self):
+        errors = self.errors()
+        if errors:
+            raise VErr(f'{len(errors)} errors found, first: {errors[0].message}', errors)
+
+
+# The collector of collecting_issues, None when issues are not collected
+_collector = None
+
+
+@contextlib.contextmanager
+def collecting_issues(stream=None):
+    global _collector
+    previous = _collector
+    _collector = IssueCollector(stream)
+    try:
+        yield _collector
+    finally:
+        _collector = previous
+
+
+def current_collector():
+    return _collector
+
+
+def report_issue(check, message, persons=(), severity='error'):
+    """Record an issue when collecting, otherwise stop on errors as the checks always did.
+
+    Warnings and info are only recorded, the checks keep printing them themselves.
+    """
+    issue = Issue(check, severity, [int(x) for x in persons], message)
+    if _collector is not None:
+        _collector.add(issue)
+    elif severity == 'error':
+        raise VErr(message, [issue])
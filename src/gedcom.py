@@ -0,0 +1,261 @@
+from array import array
+
+from sgraph import SGraph, SElement, SElementAssociation
+
+from ancestry import distinct_parents
+from life_years import dash_after, death_year_pat, yb_pat
+from pedigree_index import PedigreeIndex, as_index
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+# Date qualifiers that make a year approximate
+APPROXIMATE = {'ABT', 'EST', 'CAL', 'BEF', 'AFT', 'BET', 'FROM', 'TO', 'INT'}
+# Longest value written on one line, the rest continues on CONC lines
+MAX_VALUE_LENGTH = 200
+
+HEAD = ['0 HEAD', '1 SOUR ancestor_analytics', '1 GEDC', '2 VERS 5.5.1',
+        '2 FORM LINEAGE-LINKED', '1 CHAR UTF-8']
+
+
+def gedcom_records(lines):
+    """(xref, tag, value, [(level, tag, value)]) of each level 0 record of GEDCOM lines.
+
+    Only one record is held at a time. CONT and CONC lines are joined to the value they
+    continue.
+    """
+    record = None
+    for line in lines:
+        line = line.rstrip('\r\n').lstrip()
+        if not line:
+            continue
+        level, _, rest = line.partition(' ')
+        xref = None
+        if rest.startswith('@'):
+            xref, _, rest = rest.partition(' ')
+        tag, _, value = rest.partition(' ')
+        if level == '0':
+            if record:
+                yield record
+            record = (xref, tag, value, [])
+        elif record is None:
+            raise Exception(f'GEDCOM line outside of a record: {line}')
+        elif tag in ('CONT', 'CONC') and record[3]:
+            previous = record[3][-1]
+            record[3][-1] = previous[:2] + (previous[2] + ('\n' if tag == 'CONT' else '') +
+                                            value,)
+        elif tag not in ('CONT', 'CONC'):
+            record[3].append((int(level), tag, value))
+    if record:
+        yield record
+
+
+def name_date(date):
+    # GEDCOM date the way names write it: 12.3.1850, arviolta 1850 or 1650-1660
+    words = date.upper().split()
+    years = [w for w in words if w.isdigit() and len(w) == 4]
+    if not years:
+        return ''
+    if words[0] == 'BET' and len(years) == 2:
+        return f'{years[0]}-{years[1]}'
+    if words[0] in APPROXIMATE:
+        return f'arviolta {years[-1]}'
+    if len(words) == 3 and words[0].isdigit() and words[1] in MONTHS:
+        return f'{int(words[0])}.{MONTHS.index(words[1]) + 1}.{words[2]}'
+    return years[-1]
+
+
+def gedcom_event(part, pat):
+    # (DATE, PLAC) of the first year in a part of a name, None without a year
+    m = pat.search(part)
+    if not m:
+        return None
+    day_month, year = m.group(1), m.group(2)
+    if 'arviolta' in part or dash_after(part, m):
+        date = f'ABT {year}'
+    elif day_month and 1 <= int(day_month.split('.')[1]) <= 12:
+        day, month = day_month.split('.')[:2]
+        date = f'{int(day)} {MONTHS[int(month) - 1]} {year}'
+    else:
+        date = year
+    return date, part[m.end():].lstrip('-–0123456789 ').strip(' *')
+
+
+def read_person(lines):
+    # (name, attrs, first nested name, families the person is a child of) of an INDI record
+    name = None
+    attrs = {}
+    nested = None
+    families = []
+    events = {}
+    attr_key = event = None
+    for level, tag, value in lines:
+        if level == 1:
+            attr_key = event = None
+            if tag == 'NAME' and name is None:
+                name = value
+            elif tag == 'NOTE' and not value.startswith('@'):
+                attrs.setdefault('description', value)
+            elif tag == '_ATTR':
+                attr_key = value
+                attrs[attr_key] = ''
+            elif tag == '_NEST' and nested is None:
+                nested = value
+            elif tag == 'FAMC':
+                families.append(value)
+            elif tag in ('BIRT', 'DEAT'):
+                event = events.setdefault(tag, {})
+        elif level == 2 and attr_key is not None and tag == 'VALU':
+            attrs[attr_key] = value
+        elif level == 2 and event is not None and tag in ('DATE', 'PLAC'):
+            event.setdefault(tag, value)
+
+    first_line, newline, rest = (name or '').partition('\n')
+    if '/' in first_line:
+        first_line = ' '.join(first_line.replace('/', ' ').split())
+    # Names from other programs get the years and places the way the checks read them
+    left_part, k, right_part = first_line.partition(' K. ')
+    birth, death = events.get('BIRT', {}), events.get('DEAT', {})
+    if not yb_pat.search(left_part) and birth.get('DATE'):
+        left_part = ' '.join(x for x in (left_part, name_date(birth['DATE']), birth.get('PLAC'))
+                             if x)
+    if not k and death.get('DATE'):
+        k, right_part = ' K. ', ' '.join(x for x in (name_date(death['DATE']),
+                                                      death.get('PLAC')) if x)
+    return left_part + k + right_part + newline + rest, attrs, nested, families
+
+
+def read_gedcom(path):
+    """PedigreeIndex of the persons and parent links of a GEDCOM file.
+
+    The file is read one record at a time. The parents of a person are the HUSB, WIFE and
+    _PARENT persons of the families it is a CHIL of, or a FAMC of.
+    """
+    names = []
+    attrs = []
+    nested = {}
+    ids = {}
+    # Family xref -> parent xrefs, and (child id, family xref) links in file order
+    family_parents = {}
+    child_links = []
+    with open(path, encoding='utf-8-sig') as f:
+        for xref, tag, value, lines in gedcom_records(f):
+            if tag == 'INDI':
+                i = ids[xref] = len(names)
+                name, person_attrs, first_nested, families = read_person(lines)
+                names.append(name)
+                attrs.append(person_attrs)
+                if first_nested is not None:
+                    nested[i] = first_nested
+                child_links.extend((i, family) for family in families)
+            elif tag == 'FAM':
+                family_parents[xref] = [value for level, tag, value in lines
+                                        if level == 1 and tag in ('HUSB', 'WIFE', '_PARENT')]
+                child_links.extend((value, xref) for level, tag, value in lines
+                                   if level == 1 and tag == 'CHIL')
+
+    parents = [[] for _ in names]
+    for child, family in child_links:
+        child = ids.get(child) if isinstance(child, str) else child
+        if child is None:
+            continue
+        for parent in family_parents.get(family, ()):
+            if parent in ids and ids[parent] not in parents[child]:
+                parents[child].append(ids[parent])
+    return PedigreeIndex.from_parents(names, attrs, parents, nested)
+
+
+def index_to_sgraph(graph):
+    """SGraph of a PedigreeIndex, for writing it as sgraph XML or GraphML."""
+    index = as_index(graph)
+    root = SElement(None, '')
+    elems = []
+    for i, name in enumerate(index.names):
+        elem = SElement(None, name)
+        root.children.append(elem)
+        elem.parent = root
+        elem.attrs = dict(index.attrs[i])
+        if i in index.nested:
+            child = SElement(None, index.nested[i])
+            elem.children.append(child)
+            child.parent = elem
+        elems.append(elem)
+    for i, elem in enumerate(elems):
+        for parent in index.parents(i):
+            SElementAssociation(elem, elems[parent], 'parent').initElems()
+    return SGraph(root)
+
+
+def gedcom_lines(level, tag, value='', xref=None):
+    # One value as a line and its CONT and CONC continuation lines
+    lines = []
+    for part in value.split('\n'):
+        chunks = [part[x:x + MAX_VALUE_LENGTH] for x in range(0, len(part), MAX_VALUE_LENGTH)]
+        for c, chunk in enumerate(chunks or ['']):
+            if not lines:
+                head = f'{level} {xref} {tag}' if xref else f'{level} {tag}'
+            else:
+                head = f'{level + 1} {"CONC" if c else "CONT"}'
+            lines.append(f'{head} {chunk}' if chunk else head)
+    return lines
+
+
+def person_lines(index, i, family, spouse_families):
+    name = index.names[i]
+    lines = gedcom_lines(0, 'INDI', xref=f'@I{i + 1}@') + gedcom_lines(1, 'NAME', name)
+    left_part, k, right_part = name.split('\n', 1)[0].partition(' K. ')
+    for tag, event in (('BIRT', gedcom_event(left_part, yb_pat)),
+                       ('DEAT', gedcom_event(right_part, death_year_pat) if k else None)):
+        if event:
+            lines.append(f'1 {tag}')
+            lines.append(f'2 DATE {event[0]}')
+            if event[1]:
+                lines.extend(gedcom_lines(2, 'PLAC', event[1]))
+    for key, value in index.attrs[i].items():
+        if key == 'description':
+            lines.extend(gedcom_lines(1, 'NOTE', str(value)))
+        else:
+            lines.extend(gedcom_lines(1, '_ATTR', key) + gedcom_lines(2, 'VALU', str(value)))
+    if i in index.nested:
+        lines.extend(gedcom_lines(1, '_NEST', index.nested[i]))
+    if family != -1:
+        lines.append(f'1 FAMC @F{family + 1}@')
+    lines.extend(f'1 FAMS @F{family + 1}@' for family in spouse_families)
+    return lines
+
+
+def write_gedcom(graph, path):
+    """Write the persons and parent links of a graph as GEDCOM 5.5.1, one record at a time.
+
+    Each set of parents becomes a family with its first parent as HUSB, the second as WIFE
+    and any further ones as _PARENT, since the graph does not tell who is the father. Full
+    names are kept as NAME, and the birth and death years and places in them are also
+    written as BIRT and DEAT events for other programs.
+    """
+    index = as_index(graph)
+    families = {}
+    # Family each person is a child of, and the families of each parent
+    family_of = array('i', [-1]) * len(index)
+    spouse_families = {}
+    children = []
+    for i in range(len(index)):
+        parents = tuple(distinct_parents(index, i))
+        if not parents:
+            continue
+        family = families.setdefault(parents, len(families))
+        if family == len(children):
+            children.append(array('i'))
+            for parent in parents:
+                spouse_families.setdefault(parent, []).append(family)
+        children[family].append(i)
+        family_of[i] = family
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in HEAD)
+        for i in range(len(index)):
+            f.writelines(line + '\n' for line in
+                         person_lines(index, i, family_of[i], spouse_families.get(i, ())))
+        for parents, family in families.items():
+            f.write(f'0 @F{family + 1}@ FAM\n')
+            for tag, parent in zip(['HUSB', 'WIFE'] + ['_PARENT'] * (len(parents) - 2), parents):
+                f.write(f'1 {tag} @I{parent + 1}@\n')
+            f.writelines(f'1 CHIL @I{i + 1}@\n' for i in children[family])
+        f.write('0 TRLR\n')
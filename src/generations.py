@@ -0,0 +1,180 @@
+from array import array
+from collections import deque
+
+from ancestry import distinct_parents
+from except_utils import report_issue
+from instrument import count
+from pedigree_index import as_index
+from rules import is_known_problem_case, selected_persons
+
+
+def generation_numbers(graph, upwards=False, persons=None):
+    """Generation of every person in topological order of the parent edges.
+
+    Persons without parents are generation 0 and everybody else one more than their latest
+    parent, so a parent always has a smaller number than the child. Returns (order,
+    generations). Persons on a cycle of parent edges, and their descendants, never become
+    ready and are left out of order with generation -1. With upwards the numbers are counted
+    from the persons without children instead, so a parent has a larger number than the child.
+    With persons only they and everybody before them are numbered, the same as in the whole
+    graph, and the rest get -1.
+    """
+    index = as_index(graph)
+    n = len(index)
+    before, after = (index.children, index.parents) if upwards else \
+        (index.parents, index.children)
+    numbered = range(n)
+    if persons is not None:
+        numbered = set(persons)
+        frontier = list(numbered)
+        while frontier:
+            i = frontier.pop()
+            for x in before(i):
+                if x not in numbered:
+                    numbered.add(x)
+                    frontier.append(x)
+    waiting = array('i', [0]) * n
+    for i in numbered:
+        waiting[i] = len(set(before(i)))
+    generations = array('i', [-1]) * n
+    queue = deque(i for i in sorted(numbered) if not waiting[i])
+    for i in queue:
+        generations[i] = 0
+    order = []
+    while queue:
+        i = queue.popleft()
+        order.append(i)
+        for child in set(after(i)):
+            if child not in numbered:
+                continue
+            waiting[child] -= 1
+            if not waiting[child]:
+                # All of its parents are numbered now. Persons that never get here keep -1.
+                generations[child] = max(generations[x] for x in before(child)) + 1
+                queue.append(child)
+    count('edges traversed', len(index.child_ids))
+    return order, generations
+
+
+def find_cycles(graph, generations=None):
+    """Cycles of parent edges as lists of person ids, each one followed from child to parent."""
+    index = as_index(graph)
+    if generations is None:
+        generations = generation_numbers(index)[1]
+    # Persons left out of the topological order are on a cycle or below one. Following
+    # parents that are also left out must end up going around a cycle.
+    state = {i: 0 for i in range(len(index)) if generations[i] == -1}
+    cycles = []
+    for start in state:
+        path = []
+        i = start
+        while state.get(i) == 0:
+            state[i] = 1
+            path.append(i)
+            i = next(p for p in index.parents(i) if p in state)
+        if state.get(i) == 1:
+            cycles.append(path[path.index(i):])
+        for x in path:
+            state[x] = 2
+    return cycles
+
+
+def cycles_through(index, persons):
+    # Cycles of parent edges that go through some of the persons, each found by walking up
+    # from the person until it is reached again
+    cycles = {}
+    for start in persons:
+        via = {}
+        queue = deque([start])
+        while queue and start not in via:
+            i = queue.popleft()
+            for parent in index.parents(i):
+                if parent not in via:
+                    via[parent] = i
+                    queue.append(parent)
+        if start in via:
+            cycle = [start]
+            while via[cycle[-1]] != start:
+                cycle.append(via[cycle[-1]])
+            # Walked from parent to child, turn it around to go from child to parent
+            cycle = cycle[:1] + cycle[:0:-1]
+            cycles.setdefault(frozenset(cycle), cycle)
+    return list(cycles.values())
+
+
+def find_ancestor_cycles(graph, known_problem_cases=None, persons=None):
+    """Report cycles of parent edges, with persons only the ones through those persons."""
+    index = as_index(graph)
+    for cycle in find_cycles(index) if persons is None else cycles_through(index, persons):
+        # Every cycle starts from its first person, however it was found
+        start = cycle.index(min(cycle))
+        cycle = cycle[start:] + cycle[:start]
+        names = [index.names[i] for i in cycle]
+        if is_known_problem_case(known_problem_cases, *names):
+            continue
+        report_issue('find_ancestor_cycles', f'Person is their own ancestor: {names[0]}\n  ' +
+                     ' => '.join(names + names[:1]), cycle)
+
+
+def ancestor_path(index, generations, heights, start, ancestor):
+    # Parent path from start up to ancestor, only through persons of a later generation and a
+    # smaller height than the ancestor since no one else can descend from it. None when there
+    # is no such path. Heights of persons above a cycle are unknown and do not limit anything.
+    # Without heights only the generations limit the search, which finds the same path.
+    limit = len(index) + 1
+    if heights is not None and heights[ancestor] != -1:
+        limit = heights[ancestor]
+    via = {start: None}
+    queue = deque([start])
+    traversed = 0
+    while queue:
+        i = queue.popleft()
+        for parent in index.parents(i):
+            traversed += 1
+            if parent in via:
+                continue
+            via[parent] = i
+            if parent == ancestor:
+                count('edges traversed', traversed)
+                path = [parent]
+                while via[path[-1]] is not None:
+                    path.append(via[path[-1]])
+                return path[::-1]
+            if generations[parent] > generations[ancestor] and \
+                    (heights is None or heights[parent] < limit):
+                queue.append(parent)
+    count('edges traversed', traversed)
+    return None
+
+
+def find_if_parents_parent_is_parent(graph, known_problem_cases, persons=None):
+    """Report persons of whom a parent is also an ancestor of the other parent, at any depth.
+
+    Generation numbers counted from both ends limit the search from the other parent to the
+    persons that can be between the two parents. With persons only the generations of their
+    ancestors are numbered, and the heights that would need all descendants are left out.
+    """
+    index = as_index(graph)
+    generations = generation_numbers(index, persons=persons)[1]
+    heights = generation_numbers(index, upwards=True)[1] if persons is None else None
+    for i in selected_persons(index, persons):
+        parents = distinct_parents(index, i)
+        if len(parents) < 2 or generations[i] == -1:
+            continue
+        for parent in parents:
+            for other in parents:
+                if other == parent or generations[other] <= generations[parent] or \
+                        heights is not None and heights[other] >= heights[parent] != -1:
+                    continue
+                path = ancestor_path(index, generations, heights, other, parent)
+                if path is None or is_known_problem_case(known_problem_cases, index.names[i],
+                                                         index.names[parent]):
+                    continue
+                if len(path) == 2:
+                    message = f'Parent\'s parent {index.names[parent]} is parent for ' \
+                              f'{index.names[i]}.'
+                else:
+                    message = f'Parent\'s ancestor {index.names[parent]} ({len(path) - 1} ' \
+                              f'generations up) is parent for {index.names[i]}.\n  ' + \
+                              ' => '.join(index.names[x] for x in path)
+                report_issue('find_if_parents_parent_is_parent', message, [i, *path])
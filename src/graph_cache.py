@@ -0,0 +1,124 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from sgraph import SGraph
+
+from gedcom import index_to_sgraph, read_gedcom
+from graphml_stream import graphml_file_to_sgraph
+from pedigree_index import PedigreeIndex
+
+CACHE_FORMAT_VERSION = 1
+MAGIC = b'AAPI'
+HEADER = struct.Struct('<4sII')
+ARRAY_COLUMNS = ('parent_offsets', 'parent_ids', 'child_offsets', 'child_ids')
+
+
+def default_cache_dir():
+    return os.getenv('GRAPH_CACHE_DIR',
+                     os.path.join(os.path.expanduser('~'), '.cache', 'ancestor_analytics'))
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path_for(path, cache_dir=None):
+    return os.path.join(cache_dir or default_cache_dir(),
+                        f'{file_digest(path)}-v{CACHE_FORMAT_VERSION}.bin')
+
+
+def write_index_cache(index, path):
+    """Write the index as a columnar file: a JSON table of contents and raw column bytes.
+
+    The edge arrays are written in native int layout, 8 byte aligned, so load_index_cache can
+    use them straight from a memory map.
+    """
+    sections = {}
+    blobs = []
+    offset = 0
+
+    def add(name, data, typecode=None):
+        nonlocal offset
+        data = bytes(data)
+        sections[name] = [offset, len(data), typecode]
+        padding = -len(data) % 8
+        blobs.append(data + b'\0' * padding)
+        offset += len(data) + padding
+
+    add('names', '\0'.join(index.names).encode('utf-8'))
+    for column in ARRAY_COLUMNS:
+        values = getattr(index, column)
+        add(column, memoryview(values).cast('B'), values.format if isinstance(values, memoryview)
+            else values.typecode)
+    add('attrs', json.dumps({i: attrs for i, attrs in enumerate(index.attrs) if attrs},
+                            ensure_ascii=False).encode('utf-8'))
+    add('nested', json.dumps(index.nested, ensure_ascii=False).encode('utf-8'))
+
+    toc = json.dumps({'persons': len(index), 'sections': sections}).encode('utf-8')
+    toc += b' ' * (-(HEADER.size + len(toc)) % 8)
+
+    # Written next to the target and renamed, so a reader never maps a half written file
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CACHE_FORMAT_VERSION, len(toc)))
+        f.write(toc)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def load_index_cache(path):
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, version, toc_size = HEADER.unpack_from(view)
+    if magic != MAGIC or version != CACHE_FORMAT_VERSION:
+        raise Exception(f'Not a graph cache of version {CACHE_FORMAT_VERSION}: {path}')
+    toc = json.loads(bytes(view[HEADER.size:HEADER.size + toc_size]))
+    base = HEADER.size + toc_size
+
+    def section(name):
+        start, length, typecode = toc['sections'][name]
+        data = view[base + start:base + start + length]
+        return data.cast(typecode) if typecode else data
+
+    n = toc['persons']
+    names = str(section('names'), 'utf-8').split('\0') if n else []
+    attrs = [{} for _ in range(n)]
+    for i, person_attrs in json.loads(bytes(section('attrs'))).items():
+        attrs[int(i)] = person_attrs
+    nested = {int(i): name for i, name in json.loads(bytes(section('nested'))).items()}
+    columns = [section(column) for column in ARRAY_COLUMNS]
+    return PedigreeIndex(names, attrs, *columns, nested)
+
+
+def parse_graph_file(path):
+    if path.endswith('.ged'):
+        return index_to_sgraph(read_gedcom(path))
+    if 'graphml' in path:
+        return graphml_file_to_sgraph(path)
+    return SGraph.parse_xml(path)
+
+
+def load_index_cached(path, cache_dir=None):
+    """PedigreeIndex of a graph file, from the cache when the file content is unchanged."""
+    cache_path = cache_path_for(path, cache_dir)
+    if os.path.exists(cache_path):
+        return load_index_cache(cache_path)
+
+    if path.endswith('.ged'):
+        index = read_gedcom(path)
+    else:
+        index = PedigreeIndex.from_sgraph(parse_graph_file(path))
+    write_index_cache(index, cache_path)
+    return index
@@ -0,0 +1,69 @@
+import xml.etree.ElementTree as ET
+
+from sgraph import SGraph, SElement
+from sgraph.converters.graphml import GD_NS_IN_BRACES, handle_edge, handle_node
+
+KEY_TAG = f'{GD_NS_IN_BRACES}key'
+GRAPH_TAG = f'{GD_NS_IN_BRACES}graph'
+NODE_TAG = f'{GD_NS_IN_BRACES}node'
+EDGE_TAG = f'{GD_NS_IN_BRACES}edge'
+DATA_TAG = f'{GD_NS_IN_BRACES}data'
+
+
+def graphml_file_to_sgraph(filename_or_stream):
+    """Same graph as graphml_to_sgraph, parsed incrementally from a file.
+
+    Each top level node and edge is turned into graph elements as soon as its end tag has
+    been read and is then dropped from the XML tree, so only one node's subtree is buffered
+    at a time instead of the whole document.
+    """
+    output_root = SElement(None, '')
+    output_graph = SGraph(output_root)
+    graphml_keys = {}
+    node_id_to_element = {}
+
+    # Edges read before both of their nodes, handled once the whole file is read
+    pending_edges = []
+    # Open elements from the document root down to the current one
+    stack = []
+    for event, elem in ET.iterparse(filename_or_stream, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        # Only the direct children of a main level graph, <graphml><graph>...</graph>
+        main_level = len(stack) == 2 and parent.tag == GRAPH_TAG
+        if elem.tag == KEY_TAG and len(stack) == 1:
+            graphml_keys[elem.attrib['id']] = {x: y for x, y in elem.attrib.items() if x != 'id'}
+        elif main_level and elem.tag == NODE_TAG:
+            handle_node(elem, output_root, node_id_to_element, graphml_keys, 0)
+            parent.remove(elem)
+        elif main_level and elem.tag == EDGE_TAG:
+            if elem.attrib['source'] in node_id_to_element and \
+                    elem.attrib['target'] in node_id_to_element:
+                handle_edge(elem, node_id_to_element, graphml_keys)
+            else:
+                pending_edges.append(elem)
+            parent.remove(elem)
+        elif main_level and elem.tag == DATA_TAG:
+            handle_main_level_data(elem, graphml_keys, output_root, output_graph)
+            parent.remove(elem)
+
+    for elem in pending_edges:
+        handle_edge(elem, node_id_to_element, graphml_keys)
+    return output_graph
+
+
+def handle_main_level_data(input_data, graphml_keys, root, output_graph):
+    # Graph level attributes as in handle_main_level_graph of sgraph
+    field_spec = graphml_keys.get(input_data.attrib.get('key'))
+    if not field_spec or field_spec.get('attr.type') != 'string':
+        return
+    if not input_data.text or not input_data.text.strip():
+        return
+    if field_spec['for'] == 'graph':
+        output_graph.modelAttrs[field_spec['attr.name'].lower()] = input_data.text.strip()
+    elif field_spec['for'] == 'node':
+        root.attrs[field_spec['attr.name'].lower()] = input_data.text.strip()
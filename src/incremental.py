@@ -0,0 +1,237 @@
+import itertools
+import pickle
+
+from duplicates import carry_over_duplicate_blocks, report_duplicate_candidates
+from generations import find_ancestor_cycles, find_if_parents_parent_is_parent
+from instrument import count, timed
+from life_years import drop_year_of_birth, verify_birth_years
+from pedigree_index import as_index
+from rules import BasicNaturalRequirementsRule, ChildWithParentRule, \
+    CommonParentsWithChildrenCountsRule, ParentIsASiblingRule, UniqueNamesRule, \
+    run_person_rules
+from verifier import detect_duplicate_persons_based_on_name_and_year, \
+    find_closest_linked_ancestor_without_necessary_details, \
+    find_if_name_startswith_someones_elses_name, find_kids_with_cousins, \
+    look_for_very_similar_persons
+
+SNAPSHOT_VERSION = 1
+# With more of the ids renamed than this share the persons are taken to have moved to other
+# ids and they are matched by name instead
+MAX_RENAMED_SHARE = 0.05
+
+
+def save_snapshot(graph, path):
+    index = as_index(graph)
+    with open(path, 'wb') as f:
+        pickle.dump((SNAPSHOT_VERSION, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path):
+    with open(path, 'rb') as f:
+        version, index = pickle.load(f)
+    if version != SNAPSHOT_VERSION:
+        raise Exception(f'Unsupported snapshot version {version}: {path}')
+    return index
+
+
+def person_signature(index, i):
+    # Only what the checks look at: parents, description and nesting
+    return (sorted(index.names[p] for p in index.parents(i)),
+            index.attrs[i].get('description'), i in index.nested)
+
+
+def find_renamed_ids(previous, index):
+    """Ids with a different name in index than in previous, or found in only one of them.
+
+    None when so many differ that the persons have rather moved to other ids.
+    """
+    renamed = [i for i, (old, new) in enumerate(zip(previous.names, index.names)) if old != new]
+    if len(renamed) > MAX_RENAMED_SHARE * min(len(previous), len(index)):
+        return None
+    return renamed + list(range(min(len(previous), len(index)),
+                                max(len(previous), len(index))))
+
+
+def find_changed_persons(previous, index, renamed=None):
+    """Ids in index of persons that are new or whose parents or details changed.
+
+    With renamed from find_renamed_ids everybody else keeps their id, and only the columns
+    are compared instead of the names of everybody.
+    """
+    if renamed is not None:
+        return find_changed_in_place(previous, index, renamed)
+    previous_ids = previous.ids_by_name()
+    changed = set()
+    for i, name in enumerate(index.names):
+        old = previous_ids.get(name)
+        if not old or len(old) > 1 or \
+                person_signature(index, i) != person_signature(previous, old[0]):
+            changed.add(i)
+
+    # Relatives of removed persons lost an edge, even if nothing else changed for them.
+    current_ids = index.ids_by_name()
+    for j, name in enumerate(previous.names):
+        if name not in current_ids:
+            for relative in itertools.chain(previous.parents(j), previous.children(j)):
+                changed.update(current_ids.get(previous.names[relative], ()))
+    return changed
+
+
+def find_changed_in_place(previous, index, renamed):
+    # A renamed id is a removed person and a new one, so both of their families changed too
+    m = min(len(previous), len(index))
+    changed = {i for i in renamed if i < len(index)}
+    for i in renamed:
+        if i < len(previous):
+            changed.update(x for x in itertools.chain(previous.parents(i), previous.children(i))
+                           if x < len(index))
+        if i < len(index):
+            changed.update(itertools.chain(index.parents(i), index.children(i)))
+    if index.parent_offsets[:m + 1] != previous.parent_offsets[:m + 1] or \
+            index.parent_ids[:index.parent_offsets[m]] != \
+            previous.parent_ids[:previous.parent_offsets[m]]:
+        for i in range(m):
+            if index.parents(i) != previous.parents(i):
+                # The parents that gained or lost the child changed with it
+                changed.add(i)
+                changed.update(p for p in previous.parents(i) if p < len(index))
+                changed.update(index.parents(i))
+    changed.update(i for i in range(m) if index.attrs[i].get('description') !=
+                   previous.attrs[i].get('description'))
+    changed.update(i for i in index.nested.keys() ^ previous.nested.keys() if i < m)
+    return changed
+
+
+def reachable(persons, relatives):
+    # The persons and everybody reached from them by following relatives, like index.parents
+    found = set(persons)
+    frontier = list(found)
+    while frontier:
+        i = frontier.pop()
+        for x in relatives(i):
+            if x not in found:
+                found.add(x)
+                frontier.append(x)
+    return found
+
+
+def linking_children(index, persons):
+    # The persons and the children with one parent at or below the persons and another at or
+    # above them, the only ones whose parent can be an ancestor of the other one through them
+    above = reachable(persons, index.parents)
+    found = set(persons)
+    for below in reachable(persons, index.children):
+        found.update(child for child in index.children(below)
+                     if any(p != below and p in above for p in index.parents(child)))
+    return found
+
+
+def neighbourhood(index, persons, radius):
+    # Everybody within radius parent or child edges of the given persons
+    found = set(persons)
+    frontier = list(found)
+    for _ in range(radius):
+        next_frontier = []
+        for i in frontier:
+            for relative in itertools.chain(index.parents(i), index.children(i)):
+                if relative not in found:
+                    found.add(relative)
+                    next_frontier.append(relative)
+        frontier = next_frontier
+    return found
+
+
+def ancestors_within(index, persons, depth):
+    found = set(persons)
+    frontier = list(found)
+    for _ in range(depth):
+        next_frontier = []
+        for i in frontier:
+            for parent in index.parents(i):
+                if parent not in found:
+                    found.add(parent)
+                    next_frontier.append(parent)
+        frontier = next_frontier
+    return found
+
+
+def carry_over_issues(previous, index, issues):
+    """The issues found in previous that still stand for the persons unchanged in index.
+
+    Issues about a changed or removed person are dropped, every check of
+    verify_graph_incremental runs again for the changed persons and reports them if they
+    still hold. The others get the ids of their persons in index, by name when the persons
+    have moved to other ids.
+    """
+    renamed = find_renamed_ids(previous, index)
+    changed = find_changed_persons(previous, index, renamed)
+    current_ids = index.ids_by_name() if renamed is None else None
+    renamed = set(renamed or ())
+    kept = []
+    for issue in issues:
+        if current_ids is None:
+            persons = [p for p in issue.persons if p < len(index) and p not in renamed]
+        else:
+            persons = [current_ids[previous.names[p]][0] for p in issue.persons
+                       if len(current_ids.get(previous.names[p], ())) == 1]
+        if len(persons) == len(issue.persons) and not changed.intersection(persons):
+            kept.append(issue._replace(persons=persons))
+    return kept
+
+
+def verify_graph_incremental(previous, graph, known_problem_cases=None,
+                             exceptions_allowed_for_similar_persons=None):
+    """Rerun the verify_graph checks only where graph differs from the previous one.
+
+    previous is the earlier graph, its PedigreeIndex or a snapshot path from save_snapshot.
+    Each check runs over the neighbourhood its findings can depend on: the family up to two
+    steps away for the local checks, four steps for cousins, the name index entries sharing
+    a prefix for the name checks and the ancestors for the linked ancestor report.
+    """
+    index = as_index(graph)
+    if isinstance(previous, str):
+        previous = load_snapshot(previous)
+    else:
+        previous = as_index(previous)
+
+    with timed('find_changed_persons'):
+        renamed = find_renamed_ids(previous, index)
+        changed = find_changed_persons(previous, index, renamed)
+        if renamed is not None:
+            # The name lookups and duplicate blocks only need updating for the renamed ids
+            index.carry_over_lookups(previous, renamed)
+            carry_over_duplicate_blocks(previous, index, renamed)
+    count('persons changed', len(changed))
+    if not changed:
+        return []
+
+    with timed('person_rules'):
+        family = neighbourhood(index, changed, 2)
+        run_person_rules(index, [UniqueNamesRule(), BasicNaturalRequirementsRule()], changed)
+        run_person_rules(index, [ParentIsASiblingRule(), ChildWithParentRule(known_problem_cases),
+                                 CommonParentsWithChildrenCountsRule()], family)
+    with timed('find_ancestor_cycles'):
+        find_ancestor_cycles(index, known_problem_cases, changed)
+    with timed('find_if_parents_parent_is_parent'):
+        # A changed link can make a parent an ancestor of the other parent far below it
+        find_if_parents_parent_is_parent(index, known_problem_cases,
+                                         linking_children(index, changed))
+    with timed('detect_duplicate_persons_based_on_name_and_year'):
+        detect_duplicate_persons_based_on_name_and_year(index, changed)
+    with timed('report_duplicate_candidates'):
+        report_duplicate_candidates(index, changed)
+    with timed('find_if_name_startswith_someones_elses_name'):
+        name_issues = find_if_name_startswith_someones_elses_name(index, changed)
+    with timed('find_kids_with_cousins'):
+        find_kids_with_cousins(index, neighbourhood(index, changed, 4))
+    with timed('verify_birth_years'):
+        verify_birth_years(index, changed)
+
+    with timed('look_for_very_similar_persons'):
+        look_for_very_similar_persons(index, exceptions_allowed_for_similar_persons or (),
+                                      changed)
+    with timed('find_closest_linked_ancestor_without_necessary_details'):
+        find_closest_linked_ancestor_without_necessary_details(
+            index, persons=ancestors_within(index, changed, 8))
+    drop_year_of_birth(index)
+    return name_issues
@@ -0,0 +1,129 @@
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+
+class Instrumentation:
+    """Timers and counters of one run.
+
+    A timer adds up the calls and seconds of every block timed under its name and, with
+    trace_memory, the highest tracemalloc peak above the memory in use when a block started.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.timers = {}
+        self.counters = Counter()
+        self.start = time.perf_counter()
+        # Peaks of the timed blocks being run, outermost first
+        self._peaks = []
+
+    def summary(self):
+        return {'seconds': round(time.perf_counter() - self.start, 6),
+                'trace_memory': self.trace_memory,
+                'timers': self.timers,
+                'counters': dict(sorted(self.counters.items()))}
+
+    def write(self, out):
+        json.dump(self.summary(), out, indent=1)
+        out.write('\n')
+
+
+# The instrumentation of the run in progress, None when nothing is recorded
+_active = None
+
+
+def current_instrumentation():
+    return _active
+
+
+@contextlib.contextmanager
+def instrumenting(trace_memory=False):
+    """Record the timers and counters of the checks run inside the block."""
+    global _active
+    previous = _active
+    _active = Instrumentation(trace_memory)
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    try:
+        yield _active
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+        _active = previous
+
+
+@contextlib.contextmanager
+def timed(name):
+    instrumentation = _active
+    if instrumentation is None:
+        yield
+        return
+    timer = instrumentation.timers.setdefault(name, {'calls': 0, 'seconds': 0.0})
+    peaks = instrumentation._peaks
+    if instrumentation.trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        # The peak is reset for this block, so the enclosing one keeps what it reached so far
+        if peaks:
+            peaks[-1] = max(peaks[-1], peak)
+        peaks.append(current)
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer['calls'] += 1
+        timer['seconds'] = round(timer['seconds'] + time.perf_counter() - start, 6)
+        if instrumentation.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            block_peak = max(peak, peaks.pop())
+            timer['peak_memory'] = max(timer.get('peak_memory', 0), block_peak - current)
+            if peaks:
+                peaks[-1] = max(peaks[-1], block_peak)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.counters[name] += n
+
+
+def merge(timers, counters):
+    """Add timers and counters recorded in another process to the run in progress."""
+    if _active is None or timers is None:
+        return
+    for name, timer in timers.items():
+        total = _active.timers.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        total['calls'] += timer['calls']
+        total['seconds'] = round(total['seconds'] + timer['seconds'], 6)
+        if 'peak_memory' in timer:
+            total['peak_memory'] = max(total.get('peak_memory', 0), timer['peak_memory'])
+    _active.counters.update(counters)
+
+
+@contextlib.contextmanager
+def instrumenting_to(path=None, trace_memory=None):
+    """instrumenting() with the summary written as JSON to path, - for stderr, at the end.
+
+    path and trace_memory default to the VERIFY_INSTRUMENT and VERIFY_INSTRUMENT_MEMORY
+    environment variables. Nothing is recorded when there is no path.
+    """
+    path = path or os.getenv('VERIFY_INSTRUMENT')
+    if trace_memory is None:
+        trace_memory = os.getenv('VERIFY_INSTRUMENT_MEMORY', '') not in ('', '0')
+    if not path:
+        yield None
+        return
+    with instrumenting(trace_memory) as instrumentation:
+        try:
+            yield instrumentation
+        finally:
+            if path == '-':
+                instrumentation.write(sys.stderr)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    instrumentation.write(f)
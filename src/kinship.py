@@ -0,0 +1,194 @@
+import argparse
+import sys
+from collections import Counter, OrderedDict, namedtuple
+
+from ancestry import describe_cousins
+from graph_cache import load_index_cached
+from pedigree_index import as_index
+
+# common_ancestors holds (ancestor, distance from a, distance from b) for the nearest common
+# ancestors, degree is the number of parent links between a and b through them and path the
+# person ids from a up to the first of them and down to b. All empty or None when unrelated.
+Relationship = namedtuple('Relationship', 'a b degree description common_ancestors path')
+
+
+class KinshipIndex:
+    """Answers how two persons are related by blood, through their nearest common ancestors.
+
+    A pair is searched breadth first up the parent edges from both persons at once, so only
+    the generations up to the nearest common ancestor are walked. The complete ancestor map
+    of a person is kept in an LRU cache of cache_size persons once it has been needed, and
+    pairs with a cached person only search from the other one.
+    """
+
+    def __init__(self, graph, max_depth=32, cache_size=10000):
+        self.index = as_index(graph)
+        self.max_depth = max_depth
+        self.cache_size = cache_size
+        # person id -> ({ancestor: distance}, {ancestor: child it was reached from})
+        self._cache = OrderedDict()
+
+    def ancestors(self, i):
+        """({ancestor: distance}, {ancestor: child on a shortest path}) of i, i included."""
+        if i in self._cache:
+            self._cache.move_to_end(i)
+            return self._cache[i]
+        distances = {i: 0}
+        via = {}
+        frontier = [i]
+        for depth in range(1, self.max_depth + 1):
+            frontier = self._expand(frontier, distances, via, depth)
+            if not frontier:
+                break
+        self._cache[i] = distances, via
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return distances, via
+
+    def _expand(self, frontier, distances, via, depth):
+        # Parents of the frontier not reached before, at distance depth
+        next_frontier = []
+        for child in frontier:
+            for parent in self.index.parents(child):
+                if parent not in distances:
+                    distances[parent] = depth
+                    via[parent] = child
+                    next_frontier.append(parent)
+        return next_frontier
+
+    def _search_from(self, known, b):
+        # Breadth first up from b until no meeting with the known ancestor map as near as the
+        # best one is left, so that all nearest common ancestors are found
+        distances_a = known[0]
+        distances_b, via_b = {b: 0}, {}
+        best = distances_a.get(b)
+        frontier = [b]
+        depth = 0
+        while frontier and depth < self.max_depth and (best is None or depth + 1 <= best):
+            depth += 1
+            frontier = self._expand(frontier, distances_b, via_b, depth)
+            for x in frontier:
+                if x in distances_a and (best is None or depth + distances_a[x] < best):
+                    best = depth + distances_a[x]
+        return distances_b, via_b
+
+    def _bidirectional(self, a, b):
+        sides = [[{a: 0}, {}, [a], 0], [{b: 0}, {}, [b], 0]]
+        best = 0 if a == b else None
+
+        def lower_bound(side, other):
+            # Smallest total of a meeting the side has not reached yet: its next depth plus
+            # the nearest person the other side reached first
+            distances, _, frontier, depth = side
+            if not frontier or depth == self.max_depth:
+                return None
+            unmatched = [d for x, d in other[0].items() if x not in distances]
+            return depth + 1 + (min(unmatched) if unmatched else other[3] + 1)
+
+        while True:
+            bounds = [lower_bound(sides[0], sides[1]), lower_bound(sides[1], sides[0])]
+            candidates = [k for k in (0, 1) if bounds[k] is not None and
+                          (best is None or bounds[k] <= best)]
+            if not candidates:
+                break
+            k = min(candidates, key=lambda k: (bounds[k], len(sides[k][2])))
+            distances, via, frontier, depth = sides[k]
+            other_distances = sides[1 - k][0]
+            depth += 1
+            frontier = self._expand(frontier, distances, via, depth)
+            sides[k][2:] = frontier, depth
+            for x in frontier:
+                if x in other_distances and (best is None or depth + other_distances[x] < best):
+                    best = depth + other_distances[x]
+        return tuple(side[:2] for side in sides)
+
+    def relate(self, a, b):
+        if a in self._cache:
+            side_a = self.ancestors(a)
+            side_b = self._search_from(side_a, b)
+        elif b in self._cache:
+            side_b = self.ancestors(b)
+            side_a = self._search_from(side_b, a)
+        else:
+            side_a, side_b = self._bidirectional(a, b)
+        return self._relationship(a, b, side_a, side_b)
+
+    def _relationship(self, a, b, side_a, side_b):
+        distances_a, via_a = side_a
+        distances_b, via_b = side_b
+        common = distances_a.keys() & distances_b.keys()
+        if not common:
+            return Relationship(a, b, None, 'not related', [], [])
+        degree = min(distances_a[x] + distances_b[x] for x in common)
+        nearest = sorted((x, distances_a[x], distances_b[x]) for x in common
+                         if distances_a[x] + distances_b[x] == degree)
+        ancestor, distance_a, distance_b = nearest[0]
+        up = [ancestor]
+        while up[-1] != a:
+            up.append(via_a[up[-1]])
+        down = [ancestor]
+        while down[-1] != b:
+            down.append(via_b[down[-1]])
+        return Relationship(a, b, degree, describe_cousins(distance_a, distance_b), nearest,
+                            up[::-1] + down[1:])
+
+    def relate_many(self, pairs):
+        """Relationships of many (a, b) pairs, in the same order.
+
+        Persons appearing in several pairs get their ancestor map cached first and the pairs
+        are handled grouped by them, so each such person is walked only once.
+        """
+        counts = Counter(x for pair in pairs for x in pair)
+        order = sorted(range(len(pairs)),
+                       key=lambda k: -max(counts[pairs[k][0]], counts[pairs[k][1]]))
+        results = [None] * len(pairs)
+        for k in order:
+            a, b = pairs[k]
+            frequent = a if counts[a] >= counts[b] else b
+            if counts[frequent] > 1:
+                self.ancestors(frequent)
+            results[k] = self.relate(a, b)
+        return results
+
+
+def person_ids_by_name(index):
+    # Full names and the first lines of names that are not shared by several persons
+    ids = {}
+    first_lines = Counter(name.split('\n')[0] for name in index.names)
+    for i, name in enumerate(index.names):
+        ids[name] = i
+        first_line = name.split('\n')[0]
+        if first_lines[first_line] == 1:
+            ids[first_line] = i
+    return ids
+
+
+def write_relationships(index, relationships, out=sys.stdout):
+    for r in relationships:
+        ancestors = '; '.join(index.names[x].split('\n')[0] for x, _, _ in r.common_ancestors)
+        out.write('\t'.join([index.names[r.a].split('\n')[0], index.names[r.b].split('\n')[0],
+                             '' if r.degree is None else str(r.degree), r.description,
+                             ancestors]) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report how pairs of persons are related.')
+    parser.add_argument('graph', help='sgraph XML or GraphML file')
+    parser.add_argument('pairs', help='file of tab separated name pairs, one pair per line, '
+                                      '- for stdin')
+    parser.add_argument('--max-depth', type=int, default=32)
+    args = parser.parse_args()
+
+    index = load_index_cached(args.graph)
+    ids = person_ids_by_name(index)
+    pairs = []
+    with (sys.stdin if args.pairs == '-' else open(args.pairs, encoding='utf-8')) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            a, b = line.rstrip('\n').split('\t')
+            if a not in ids or b not in ids:
+                raise Exception(f'Unknown or ambiguous name in pair: {line.strip()}')
+            pairs.append((ids[a], ids[b]))
+
+    write_relationships(index, KinshipIndex(index, args.max_depth).relate_many(pairs))
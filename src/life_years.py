@@ -0,0 +1,147 @@
+import itertools
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from except_utils import report_issue
+from instrument import count
+from pedigree_index import as_index
+
+# Youngest and oldest plausible age of a parent when a child is born
+MIN_PARENT_AGE = 13
+MAX_PARENT_AGE = 75
+MAX_LIFESPAN = 110
+# How many years an approximate (arviolta) year may be off in either direction
+APPROXIMATION = 10
+# A father may die before his child is born
+BORN_AFTER_DEATH = 1
+
+# Year columns of all persons, 0 where the year is not known
+LifeYears = namedtuple('LifeYears', 'birth death birth_approximate death_approximate')
+
+yb_pat = re.compile(r'[A-ZÅÄÖa-zåäö()] ([0-9][0-9]?\.[0-9][0-9]?\.)?([12][0-9][0-9][0-9])')
+death_year_pat = re.compile(r'([0-9][0-9]?\.[0-9][0-9]?\.)?([12][0-9][0-9][0-9])')
+
+
+def dash_after(left_part, match):
+    end = match.end()
+    if len(left_part) > end:
+        x = left_part[end]
+        return x in {'-', '–'}
+    return False
+
+
+def parse_years(part, pat):
+    # (year, approximate) of the first year in part, a year range like 1650-1660 counts as
+    # approximate
+    m = pat.search(part)
+    if not m:
+        return 0, False
+    return int(m.group(2)), 'arviolta' in part or dash_after(part, m)
+
+
+def person_life_years(name, attrs):
+    # ((birth year, approximate), (death year, approximate)) of one person
+    left_part, k, right_part = name.split('\n', 1)[0].partition(' K. ')
+    year, approximate = parse_years(left_part, yb_pat)
+    if not year and str(attrs.get('year_of_birth', '')).isdigit():
+        year = int(attrs['year_of_birth'])
+    return (year, approximate), parse_years(right_part, death_year_pat) if k else (0, False)
+
+
+def parse_life_years(graph, persons=None):
+    """Birth and death years of every person parsed from the first line of the name.
+
+    The death year follows " K. ". A year_of_birth attribute is used when the name has no
+    birth year. With persons only their names are parsed and everybody else gets 0.
+    """
+    index = as_index(graph)
+    if persons is None:
+        persons = range(len(index))
+        years = np.array([person_life_years(name, attrs)
+                          for name, attrs in zip(index.names, index.attrs)],
+                         dtype=np.int32).reshape(-1, 4)
+    else:
+        years = np.zeros((len(index), 4), dtype=np.int32)
+        for i in persons:
+            years[i] = np.ravel(person_life_years(index.names[i], index.attrs[i]))
+    # The death year is only searched for after " K. "
+    count('regex evaluations', len(persons) +
+          sum(' K. ' in index.names[i].split('\n', 1)[0] for i in persons))
+    birth, death = years[:, :2], years[:, 2:]
+    return LifeYears(birth[:, 0], death[:, 0], birth[:, 1] > 0, death[:, 1] > 0)
+
+
+def drop_year_of_birth(graph):
+    # year_of_birth only stands in for a missing birth year in the name. It is dropped once
+    # the checks that read the years have run.
+    for attrs in as_index(graph).attrs:
+        attrs.pop('year_of_birth', None)
+
+
+def parent_edges(index):
+    # (child, parent) id columns with one row per parent link
+    offsets = np.asarray(index.parent_offsets, dtype=np.int64)
+    children = np.repeat(np.arange(len(index), dtype=np.int64), np.diff(offsets))
+    return children, np.asarray(index.parent_ids, dtype=np.int64)
+
+
+def verify_birth_years(graph, persons=None, years=None):
+    """Report implausible parent ages, lifespans and children born after a parent's death.
+
+    All comparisons run over whole columns. Approximate years get APPROXIMATION years of
+    slack. With persons, only the lifespans of those persons and the parent links touching
+    them are checked.
+    """
+    index = as_index(graph)
+    if years is None and persons is not None:
+        # Only the persons and the other ends of their parent links are compared
+        years = parse_life_years(index, {x for i in persons for x in itertools.chain(
+            [i], index.parents(i), index.children(i))})
+    years = years or parse_life_years(index)
+    birth, death = years.birth, years.death
+    children, parents = parent_edges(index)
+    if persons is not None:
+        selected = np.zeros(len(index), dtype=bool)
+        selected[list(persons)] = True
+        edge_mask = selected[children] | selected[parents]
+        children, parents = children[edge_mask], parents[edge_mask]
+    else:
+        selected = np.ones(len(index), dtype=bool)
+
+    slack = approximation(years.birth_approximate[children], years.birth_approximate[parents])
+    known = (birth[children] > 0) & (birth[parents] > 0)
+    gap = birth[children] - birth[parents]
+    report_links('Parent too young', known & (gap < MIN_PARENT_AGE - slack), children, parents,
+                 index)
+    report_links('Parent too old', known & (gap > MAX_PARENT_AGE + slack), children, parents,
+                 index)
+
+    slack = approximation(years.birth_approximate[children], years.death_approximate[parents])
+    died = (birth[children] > 0) & (death[parents] > 0)
+    report_links('Child born after parent\'s death',
+                 died & (birth[children] > death[parents] + BORN_AFTER_DEATH + slack),
+                 children, parents, index)
+
+    slack = approximation(years.birth_approximate, years.death_approximate)
+    lived = selected & (birth > 0) & (death > 0)
+    lifespan = death - birth
+    for message, wrong in (('Death before birth', lived & (lifespan < -slack)),
+                           ('Too long lifespan', lived & (lifespan > MAX_LIFESPAN + slack))):
+        for i in np.flatnonzero(wrong).tolist():
+            print(f'{message} ({lifespan[i]} years): {index.names[i]}')
+            report_issue('verify_birth_years', f'{message}: {index.names[i]}', [i], 'warning')
+
+
+def approximation(*approximate):
+    # Allowed error of a difference of years, APPROXIMATION for each approximate year in it
+    return sum(x.astype(np.int32) for x in approximate) * APPROXIMATION
+
+
+def report_links(message, wrong, children, parents, index):
+    for child, parent in zip(children[wrong].tolist(), parents[wrong].tolist()):
+        print(f'{message}: {index.names[child]}\n'
+              f'    parent={index.names[parent]}')
+        report_issue('verify_birth_years', f'{message}: {index.names[child]} '
+                     f'parent={index.names[parent]}', [child, parent], 'warning')
@@ -0,0 +1,213 @@
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from components import component_members
+from except_utils import VErr, collecting_issues, current_collector
+from instrument import current_instrumentation, instrumenting, merge, timed
+from life_years import drop_year_of_birth
+from pedigree_index import as_index
+from verifier import split_verification_checks, verification_checks
+
+CheckResult = namedtuple('CheckResult', 'name result error stdout stderr wall_time peak_memory '
+                                        'issues timers counters')
+
+# The index each worker process received when it was started
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def run_check(index, name, check, args, trace_memory=False, collect=False, instrument=None):
+    """Run one check with its output captured, returning a CheckResult.
+
+    With collect the issues the check reports are collected into the result instead of the
+    first error stopping the check. With instrument, the trace_memory of the run in progress,
+    the check is timed under its name and the timers and counters are returned in the
+    result to be merged into that run.
+    """
+    out = io.StringIO()
+    err = io.StringIO()
+    result = None
+    error = None
+    issues = []
+    timers = counters = None
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err), \
+                collecting_issues() if collect else contextlib.nullcontext() as collector, \
+                instrumenting(instrument) if instrument is not None else \
+                contextlib.nullcontext() as instrumentation:
+            if collector is not None:
+                issues = collector.issues
+            if instrumentation is not None:
+                timers, counters = instrumentation.timers, instrumentation.counters
+            with timed(name):
+                result = check(index, *args)
+    except Exception as e:
+        error = e
+    wall_time = time.perf_counter() - start
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return CheckResult(name, result, error, out.getvalue(), err.getvalue(), wall_time,
+                       peak_memory, issues, timers, counters)
+
+
+def _run_check_in_worker(name, check, args, trace_memory, collect, instrument):
+    return run_check(_worker_index, name, check, args, trace_memory, collect, instrument)
+
+
+def instrument_flag():
+    # What run_check takes as instrument: the trace_memory of the run in progress, if any
+    instrumentation = current_instrumentation()
+    return None if instrumentation is None else instrumentation.trace_memory
+
+
+def run_checks_parallel(graph, checks, workers=None, trace_memory=False, collect=False,
+                        instrument=None):
+    """Run (name, check, args) checks in a process pool, results in the order of checks.
+
+    The compact index is handed to each worker once when the worker starts instead of
+    being pickled for every task.
+    """
+    index = as_index(graph)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(index,)) as pool:
+        futures = [pool.submit(_run_check_in_worker, name, check, args, trace_memory, collect,
+                               instrument)
+                   for name, check, args in checks]
+        return [future.result() for future in futures]
+
+
+def write_timings(results, out=sys.stderr):
+    for r in results:
+        peak = '' if r.peak_memory is None else f'  peak {r.peak_memory / 1024 / 1024:.1f} MB'
+        status = '  FAILED' if r.error is not None else ''
+        out.write(f'{r.name:<56} {r.wall_time:8.3f} s{peak}{status}\n')
+
+
+def verify_graph_parallel(graph, known_problem_cases=None,
+                          exceptions_allowed_for_similar_persons=None, workers=None,
+                          trace_memory=False, timings=True):
+    """verify_graph with the checks run concurrently.
+
+    Output is replayed and the first error raised in the same check order as verify_graph
+    uses, so the result does not depend on which worker finishes first. trace_memory records
+    the peak Python allocation per check with tracemalloc, which slows the checks down.
+    Inside collecting_issues the workers collect their issues and they are added to the
+    active collector in the same order.
+    """
+    index = as_index(graph)
+
+    collector = current_collector()
+    results = run_checks_parallel(
+        index, verification_checks(known_problem_cases, exceptions_allowed_for_similar_persons),
+        workers, trace_memory, collector is not None, instrument_flag())
+    drop_year_of_birth(index)
+    if timings:
+        write_timings(results)
+
+    name_issues = []
+    for r in results:
+        sys.stdout.write(r.stdout)
+        sys.stderr.write(r.stderr)
+        merge(r.timers, r.counters)
+        for issue in r.issues:
+            collector.add(issue)
+        if r.error is not None:
+            raise r.error
+        if r.name == 'find_if_name_startswith_someones_elses_name':
+            name_issues = r.result
+    return name_issues
+
+
+def component_shards(index, shard_size):
+    """Person ids of shards made of whole connected components, about shard_size each.
+
+    A component larger than shard_size is a shard of its own.
+    """
+    shards = []
+    shard = []
+    for ids in sorted(component_members(index), key=len, reverse=True):
+        if shard and len(shard) + len(ids) > shard_size:
+            shards.append(sorted(shard))
+            shard = []
+        shard.extend(ids)
+    if shard:
+        shards.append(sorted(shard))
+    return shards
+
+
+def _run_shard(shard_index, checks, collect, instrument):
+    return [run_check(shard_index, name, check, args, collect=collect, instrument=instrument)
+            for name, check, args in checks]
+
+
+def verify_graph_sharded(graph, known_problem_cases=None,
+                         exceptions_allowed_for_similar_persons=None, workers=None,
+                         shard_size=None):
+    """verify_graph with the graph split into connected components verified in a pool.
+
+    The checks that only follow family links run in the workers, each worker holding only
+    the index of its shard. The name checks need every name and run once in this process
+    while the workers are busy. Output and issues are replayed check by check and shard by
+    shard, with the person ids of the issues mapped back to the whole graph.
+    """
+    index = as_index(graph)
+    whole_graph_checks, component_checks = split_verification_checks(
+        known_problem_cases, exceptions_allowed_for_similar_persons)
+    workers = workers or os.cpu_count()
+    shard_size = shard_size or max(1000, math.ceil(len(index) / (4 * workers)))
+    collector = current_collector()
+    collect = collector is not None
+    instrument = instrument_flag()
+
+    shards = component_shards(index, shard_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_shard, index.subset(ids), component_checks, collect,
+                               instrument)
+                   for ids in shards]
+        # (person ids of the shard or None for the whole graph, CheckResult) in replay order
+        results = [(None, run_check(index, name, check, args, collect=collect,
+                                    instrument=instrument))
+                   for name, check, args in whole_graph_checks]
+        shard_results = [future.result() for future in futures]
+    drop_year_of_birth(index)
+    for k in range(len(component_checks)):
+        results.extend((ids, shard_result[k]) for ids, shard_result in zip(shards, shard_results))
+
+    def whole_graph_issue(ids, issue):
+        if ids is None:
+            return issue
+        return issue._replace(persons=[ids[p] for p in issue.persons])
+
+    name_issues = []
+    first_error = None
+    for ids, r in results:
+        sys.stdout.write(r.stdout)
+        sys.stderr.write(r.stderr)
+        merge(r.timers, r.counters)
+        for issue in r.issues:
+            collector.add(whole_graph_issue(ids, issue))
+        if r.error is not None and first_error is None:
+            first_error = r.error
+            if isinstance(first_error, VErr) and first_error.errors:
+                first_error.errors = [whole_graph_issue(ids, x) for x in first_error.errors]
+        if r.name == 'find_if_name_startswith_someones_elses_name':
+            name_issues = r.result
+    if first_error is not None:
+        raise first_error
+    return name_issues
@@ -0,0 +1,191 @@
+import bisect
+from array import array
+
+
+class PedigreeIndex:
+    """Compact, integer indexed view of the persons and parent edges of an SGraph.
+
+    Persons are numbered densely in the order of graph.rootNode.children. Parent and child
+    edges are stored CSR style: the parents of person i are
+    parent_ids[parent_offsets[i]:parent_offsets[i + 1]], and likewise for children. Names and
+    attrs are parallel columns indexed by the same numbers.
+    """
+
+    def __init__(self, names, attrs, parent_offsets, parent_ids, child_offsets, child_ids,
+                 nested=None):
+        self.names = names
+        self.attrs = attrs
+        self.parent_offsets = parent_offsets
+        self.parent_ids = parent_ids
+        self.child_offsets = child_offsets
+        self.child_ids = child_ids
+        # person id -> name of the first element nested under the person, if any
+        self.nested = nested or {}
+        # Built on first use by the name lookups below
+        self._sorted_names = None
+        self._ids_by_name = None
+        # Built on first use by duplicates.duplicate_blocks
+        self._duplicate_blocks = None
+
+    @staticmethod
+    def from_sgraph(graph):
+        persons = graph.rootNode.children
+        ids = {elem: i for i, elem in enumerate(persons)}
+        names = []
+        attrs = []
+        nested = {}
+        parent_offsets = array('i', [0])
+        parent_ids = array('i')
+        child_offsets = array('i', [0])
+        child_ids = array('i')
+        for i, elem in enumerate(persons):
+            names.append(elem.name)
+            attrs.append(elem.attrs)
+            if elem.children:
+                nested[i] = elem.children[0].name
+            # Edges to elements outside the root level are not persons and are left out.
+            parent_ids.extend(ids[ea.toElement] for ea in elem.outgoing if ea.toElement in ids)
+            parent_offsets.append(len(parent_ids))
+            child_ids.extend(ids[ea.fromElement] for ea in elem.incoming if ea.fromElement in ids)
+            child_offsets.append(len(child_ids))
+
+        return PedigreeIndex(names, attrs, parent_offsets, parent_ids, child_offsets, child_ids,
+                             nested)
+
+    @staticmethod
+    def from_parents(names, attrs, parents, nested=None):
+        """Index of persons given as parallel columns, parents[i] being the parent ids of i."""
+        parent_offsets = array('i', [0])
+        parent_ids = array('i')
+        child_counts = array('i', bytes(4 * (len(names) + 1)))
+        for person_parents in parents:
+            parent_ids.extend(person_parents)
+            parent_offsets.append(len(parent_ids))
+            for parent in person_parents:
+                child_counts[parent + 1] += 1
+        child_offsets = array('i', [0])
+        for count in child_counts[1:]:
+            child_offsets.append(child_offsets[-1] + count)
+        # Children in id order, each one placed at the next free slot of its parents
+        child_ids = array('i', bytes(4 * len(parent_ids)))
+        free = array('i', child_offsets[:-1])
+        for i, person_parents in enumerate(parents):
+            for parent in person_parents:
+                child_ids[free[parent]] = i
+                free[parent] += 1
+        return PedigreeIndex(names, attrs, parent_offsets, parent_ids, child_offsets, child_ids,
+                             nested)
+
+    def __getstate__(self):
+        # Columns mapped from a cache file are memoryviews, which cannot be pickled.
+        state = dict(self.__dict__)
+        for column in ('parent_offsets', 'parent_ids', 'child_offsets', 'child_ids'):
+            values = state[column]
+            if isinstance(values, memoryview):
+                state[column] = array(values.format)
+                state[column].frombytes(values.tobytes())
+        return state
+
+    def __len__(self):
+        return len(self.names)
+
+    def parents(self, i):
+        return self.parent_ids[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+
+    def children(self, i):
+        return self.child_ids[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def parent_count(self, i):
+        return self.parent_offsets[i + 1] - self.parent_offsets[i]
+
+    def child_count(self, i):
+        return self.child_offsets[i + 1] - self.child_offsets[i]
+
+    def sorted_names(self):
+        if self._sorted_names is None:
+            self._sorted_names = sorted((name, i) for i, name in enumerate(self.names))
+        return self._sorted_names
+
+    def ids_by_name(self):
+        if self._ids_by_name is None:
+            self._ids_by_name = {}
+            for i, name in enumerate(self.names):
+                self._ids_by_name.setdefault(name, []).append(i)
+        return self._ids_by_name
+
+    def carry_over_lookups(self, previous, renamed):
+        """Take the name lookups previous has built, updated for the renamed ids.
+
+        Every other id must have the same name in both indexes. Ids found in only one of
+        them count as renamed.
+        """
+        if previous._sorted_names is not None and self._sorted_names is None:
+            sorted_names = list(previous._sorted_names)
+            for i in renamed:
+                if i < len(previous):
+                    del sorted_names[bisect.bisect_left(sorted_names, (previous.names[i], i))]
+            for i in renamed:
+                if i < len(self):
+                    bisect.insort(sorted_names, (self.names[i], i))
+            self._sorted_names = sorted_names
+        if previous._ids_by_name is not None and self._ids_by_name is None:
+            ids_by_name = dict(previous._ids_by_name)
+            for i in renamed:
+                if i < len(previous):
+                    ids = [x for x in ids_by_name[previous.names[i]] if x != i]
+                    if ids:
+                        ids_by_name[previous.names[i]] = ids
+                    else:
+                        del ids_by_name[previous.names[i]]
+            for i in renamed:
+                if i < len(self):
+                    ids = list(ids_by_name.get(self.names[i], ()))
+                    bisect.insort(ids, i)
+                    ids_by_name[self.names[i]] = ids
+            self._ids_by_name = ids_by_name
+
+    def ids_with_prefix(self, prefix):
+        sorted_names = self.sorted_names()
+        ids = []
+        for pos in range(bisect.bisect_left(sorted_names, (prefix,)), len(sorted_names)):
+            name, i = sorted_names[pos]
+            if not name.startswith(prefix):
+                break
+            ids.append(i)
+        return ids
+
+    def ids_named(self, name):
+        # Same as ids_by_name().get(name, []) from the sorted names, when those are at hand
+        sorted_names = self.sorted_names()
+        ids = []
+        for pos in range(bisect.bisect_left(sorted_names, (name,)), len(sorted_names)):
+            if sorted_names[pos][0] != name:
+                break
+            ids.append(sorted_names[pos][1])
+        return ids
+
+    def subset(self, ids):
+        """Index of only the given persons, numbered in the order of ids.
+
+        Edges to persons outside ids are left out, so for a connected component nothing is
+        lost. Person k of the subset is ids[k] of this index.
+        """
+        new_ids = {i: k for k, i in enumerate(ids)}
+        parent_offsets = array('i', [0])
+        parent_ids = array('i')
+        child_offsets = array('i', [0])
+        child_ids = array('i')
+        for i in ids:
+            parent_ids.extend(new_ids[p] for p in self.parents(i) if p in new_ids)
+            parent_offsets.append(len(parent_ids))
+            child_ids.extend(new_ids[c] for c in self.children(i) if c in new_ids)
+            child_offsets.append(len(child_ids))
+        nested = {new_ids[i]: name for i, name in self.nested.items() if i in new_ids}
+        return PedigreeIndex([self.names[i] for i in ids], [self.attrs[i] for i in ids],
+                             parent_offsets, parent_ids, child_offsets, child_ids, nested)
+
+
+def as_index(graph):
+    if isinstance(graph, PedigreeIndex):
+        return graph
+    return PedigreeIndex.from_sgraph(graph)
@@ -0,0 +1,179 @@
+import sys
+
+from except_utils import report_issue
+from instrument import count
+from pedigree_index import as_index
+
+
+def selected_persons(index, persons):
+    # Checks run over everybody unless a subset of person ids is given
+    if persons is None:
+        return range(len(index))
+    return sorted(persons)
+
+
+def is_known_problem_case(known_problem_cases, *names):
+    for known in known_problem_cases or ():
+        for name in names:
+            if known in name:
+                return True
+    return False
+
+
+class Neighbourhood:
+    """The close relatives of one person, looked up once and shared by all rules."""
+    __slots__ = 'index', 'person', 'name', 'parents', 'children', 'grandparents', \
+        'parents_of_children'
+
+    def __init__(self, index, i):
+        self.index = index
+        self.person = i
+        self.name = index.names[i]
+        self.parents = index.parents(i)
+        self.children = index.children(i)
+        # Parents of each parent and of each child, in the same order as parents and children
+        self.grandparents = [index.parents(p) for p in self.parents]
+        self.parents_of_children = [index.parents(c) for c in self.children]
+
+
+class PersonRule:
+    """A local check run by run_person_rules for each person in turn.
+
+    check is the name its issues are reported under.
+    """
+    check = None
+
+    def start(self, index):
+        pass
+
+    def visit(self, hood):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class UniqueNamesRule(PersonRule):
+    check = 'verify_unique_names'
+
+    def __init__(self):
+        self.repeated = set()
+
+    def start(self, index):
+        names = set()
+        for name in index.names:
+            if name in names:
+                self.repeated.add(name)
+            names.add(name)
+
+    def visit(self, hood):
+        if hood.name in self.repeated:
+            report_issue(self.check, 'Non-unique names: ' + hood.name, [hood.person])
+
+
+class BasicNaturalRequirementsRule(PersonRule):
+    check = 'verify_basic_natural_requirements'
+
+    def visit(self, hood):
+        if len(hood.parents) > 2:
+            report_issue(self.check, f'Invalid combination, three parents: {hood.name}\n'
+                                     f'  {[hood.index.names[x] for x in hood.parents]}',
+                         [hood.person, *hood.parents])
+        if hood.person in hood.index.nested:
+            report_issue(self.check, f'Element {hood.name} has children: '
+                                     f'{hood.index.nested[hood.person]}', [hood.person])
+
+
+class ParentIsASiblingRule(PersonRule):
+    check = 'find_parent_is_a_sibling_and_other_stuff'
+
+    def __init__(self):
+        self.issues = []
+
+    def visit(self, hood):
+        for pparents in hood.grandparents:
+            for pparent in pparents:
+                if pparent in hood.parents:
+                    issue = (hood.name, [hood.index.names[x] for x in hood.parents])
+                    self.issues.append(issue)
+                    report_issue(self.check, f'Parent == parents.parent: {issue}',
+                                 [hood.person, *hood.parents], 'warning')
+
+    def finish(self):
+        if self.issues:
+            print('Found issues with parent == parents.parent')
+            for issue in self.issues:
+                print(issue)
+
+
+class ChildWithParentRule(PersonRule):
+    check = 'find_getting_child_with_parent'
+
+    def __init__(self, known_problem_cases):
+        self.known_problem_cases = known_problem_cases
+
+    def visit(self, hood):
+        for parents_of_child in hood.parents_of_children:
+            for parent_of_child in parents_of_child:
+                if parent_of_child in hood.parents:
+                    parent_name = hood.index.names[parent_of_child]
+                    if not is_known_problem_case(self.known_problem_cases, hood.name,
+                                                 parent_name):
+                        report_issue(self.check, f'Child with a parent: {hood.name} '
+                                                 f'parent={parent_name}',
+                                     [hood.person, parent_of_child])
+
+
+class CommonParentsWithChildrenCountsRule(PersonRule):
+    check = 'verify_common_parents_with_children_counts'
+
+    def visit(self, hood):
+        if not hood.children:
+            return
+        index = hood.index
+        parents = set(p for parents_of_child in hood.parents_of_children for p in parents_of_child)
+        parents.discard(hood.person)
+        persons = [hood.person, *sorted(parents)]
+        if len(parents) > 3:
+            report_issue(self.check, 'Suspiciously high number of common parents, must be an '
+                                     'error\n', persons)
+        elif len(parents) > 2:
+            sys.stderr.write('Suspiciously high number of common parents: \n')
+            parents_names = set(index.names[p] for p in parents)
+            parents_names.add(hood.name)
+            sys.stderr.write(str(parents_names) + '\n')
+            report_issue(self.check, 'Suspiciously high number of common parents: ' +
+                         ', '.join(sorted(parents_names)), persons, 'warning')
+        elif len(parents) > 1:
+            print(f'{hood.name} has {len(hood.children)} children who have {len(parents)} '
+                  f'other parents: ')
+            for parent in parents:
+                print(f'   {index.names[parent]}  kids: {index.child_count(parent)}')
+            report_issue(self.check, f'{hood.name} has {len(hood.children)} children who have '
+                                     f'{len(parents)} other parents', persons, 'info')
+
+
+def default_person_rules(known_problem_cases=None):
+    return [
+        UniqueNamesRule(),
+        BasicNaturalRequirementsRule(),
+        ParentIsASiblingRule(),
+        ChildWithParentRule(known_problem_cases),
+        CommonParentsWithChildrenCountsRule(),
+    ]
+
+
+def run_person_rules(graph, rules, persons=None):
+    """Visit every person once and let each rule check the shared neighbourhood."""
+    index = as_index(graph)
+    for rule in rules:
+        rule.start(index)
+    visits = [rule.visit for rule in rules]
+    selected = selected_persons(index, persons)
+    for i in selected:
+        hood = Neighbourhood(index, i)
+        for visit in visits:
+            visit(hood)
+    count('persons visited', len(selected))
+    for rule in rules:
+        rule.finish()
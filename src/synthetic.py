@@ -0,0 +1,122 @@
+import random
+
+from sgraph import SGraph, SElement, SElementAssociation
+
+FIRST_NAMES = ['Matti', 'Juho', 'Johan', 'Antti', 'Heikki', 'Erkki', 'Kustaa', 'Gustaf', 'Jaakko',
+               'Pekka', 'Maria', 'Maija', 'Liisa', 'Elisabet', 'Anna', 'Kaisa', 'Katarina',
+               'Helena', 'Brita', 'Valpuri']
+LAST_NAMES = ['Aho', 'Laine', 'Virtanen', 'Mäkinen', 'Nieminen', 'Heikkilä', 'Koskinen',
+              'Järvinen', 'Lehtonen', 'Saarinen', 'Salminen', 'Hämäläinen', 'Lindholm', 'Ström']
+PLACES = ['Turku', 'Oulu', 'Vaasa', 'Pori', 'Rauma', 'Hämeenlinna', 'Porvoo', 'Kokkola',
+          'Tornio', 'Uusikaupunki']
+
+
+def generate_pedigree(persons, seed=0, generation_size=None, pedigree_collapse=0.05,
+                      name_collisions=0.01, missing_parents=0.1, descriptions=0.05,
+                      first_year=1500):
+    """Deterministic synthetic family tree as an SGraph in the format the verifier expects.
+
+    Persons are created generation by generation, 25 years apart, and live 40 to 90 years so
+    that parent ages stay plausible for verify_birth_years. The previous generation is
+    paired into couples and each person of a later generation is a child of one of them,
+    except for the missing_parents share that gets no parents. pedigree_collapse is the
+    share of couples formed from cousins instead of random partners. name_collisions is the
+    share of persons reusing the name and birth year of an earlier person of the same
+    generation with a later death year. descriptions is the share of persons with a description attribute.
+    """
+    rnd = random.Random(seed)
+    generation_size = generation_size or max(10, int(persons ** 0.5) * 4)
+    root = SElement(None, '')
+    graph = SGraph(root)
+
+    # first line of the name -> year of death used last with it
+    first_lines = {}
+    # first lines used in the current generation, reused for the name collisions
+    generation_lines = []
+    # (first 8 chars, year of birth, year of death) in use, see look_for_very_similar_persons
+    lifespans = set()
+    parents_of = {}
+    children_of = {}
+    couples = []
+    generation = []
+    for created in range(persons):
+        if len(generation) == generation_size:
+            couples = form_couples(rnd, generation, parents_of, children_of, pedigree_collapse)
+            generation = []
+            generation_lines = []
+
+        if generation_lines and rnd.random() < name_collisions:
+            first_line = rnd.choice(generation_lines)
+        else:
+            year = first_year + 25 * (created // generation_size) + rnd.randint(0, 10)
+            first_line = f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {year}'
+        if first_line in first_lines:
+            # A later death year keeps the full names and lifespans unique.
+            year_of_death = first_lines[first_line] + 1
+        else:
+            year_of_death = year + rnd.randint(40, 90)
+            generation_lines.append(first_line)
+        year_of_birth = first_line.rsplit(' ', 1)[1]
+        while (first_line[0:8], year_of_birth, year_of_death) in lifespans:
+            year_of_death += 1
+        lifespans.add((first_line[0:8], year_of_birth, year_of_death))
+        first_lines[first_line] = year_of_death
+        name = f'{first_line} {rnd.choice(PLACES)} K. {year_of_death} {rnd.choice(PLACES)}'
+
+        elem = SElement(None, name)
+        root.children.append(elem)
+        elem.parent = root
+        if rnd.random() < descriptions:
+            elem.name += f' **\n{created}'
+            elem.attrs['description'] = f'Description of person {created}'
+
+        if couples and rnd.random() >= missing_parents:
+            couple = rnd.choice(couples)
+            parents_of[elem] = couple
+            for parent in couple:
+                children_of.setdefault(parent, []).append(elem)
+                SElementAssociation(elem, parent, 'parent').initElems()
+        generation.append(elem)
+
+    return graph
+
+
+def form_couples(rnd, generation, parents_of, children_of, pedigree_collapse):
+    singles = list(generation)
+    rnd.shuffle(singles)
+    taken = set()
+    couples = []
+    i = 0
+    while i < len(singles):
+        person = singles[i]
+        i += 1
+        if person in taken:
+            continue
+        taken.add(person)
+        partner = None
+        if rnd.random() < pedigree_collapse:
+            cousins = [x for x in find_cousins(person, parents_of, children_of) if x not in taken]
+            if cousins:
+                partner = rnd.choice(cousins)
+        if partner is None:
+            while i < len(singles) and singles[i] in taken:
+                i += 1
+            if i == len(singles):
+                break
+            partner = singles[i]
+            i += 1
+        taken.add(partner)
+        couples.append((person, partner))
+    return couples
+
+
+def find_cousins(person, parents_of, children_of):
+    # Children of the siblings of the parents
+    parents = parents_of.get(person, ())
+    cousins = []
+    for parent in parents:
+        for grandparent in parents_of.get(parent, ()):
+            for uncle in children_of.get(grandparent, ()):
+                if uncle not in parents:
+                    cousins.extend(children_of.get(uncle, ()))
+    return cousins
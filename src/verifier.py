@@ -1,388 +1,310 @@
-import copy
 import re
 import sys
-from typing import Dict, Set, List
+from typing import Dict, Set
 
-from sgraph import SElement
+from ancestry import ancestors_at, distinct_parents, find_related_parents, leaf_distances, \
+    path_to_leaf
+from components import verify_components
+from duplicates import report_duplicate_candidates
+from except_utils import conditional_raise, report_issue
+from generations import find_ancestor_cycles, find_if_parents_parent_is_parent
+from graph_cache import load_index_cached
+from instrument import count, timed
+from life_years import drop_year_of_birth, verify_birth_years
+from pedigree_index import as_index
+from rules import BasicNaturalRequirementsRule, ChildWithParentRule, \
+    CommonParentsWithChildrenCountsRule, ParentIsASiblingRule, UniqueNamesRule, \
+    default_person_rules, run_person_rules, selected_persons
 
-from except_utils import conditional_raise
 
-yb_pat = re.compile(r'[A-ZÅÄÖa-zåäö()] ([0-9][0-9]?\.[0-9][0-9]?\.)?([12][0-9][0-9][0-9])')
+def get_cousins(i, second_level_ancestors_dict, second_level_descendants_dict):
+    # A cousin sharing several grandparents is still listed once
+    cousins = set()
+    for ancestor in second_level_ancestors_dict[i]:
+        cousins.update(second_level_descendants_dict[ancestor])
+    cousins.discard(i)
+    return sorted(cousins)
 
 
-def dash_after(left_part, match):
-    end = match.end()
-    if len(left_part) > end:
-        x = left_part[end]
-        return x in {'-', '–'}
-    return False
+def get_second_level_descendants(index, i):
+    for child in index.children(i):
+        yield from index.children(child)
 
 
+def get_second_level_ancestors(index, i):
+    for parent in index.parents(i):
+        yield from index.parents(parent)
 
-def get_cousins(elem, second_level_ancestors_dict, second_level_descendants_dict):
-    cousins = []
-    for ancestor in second_level_ancestors_dict[elem]:
-        for cousin in second_level_descendants_dict[ancestor]:
-            cousins.append(cousin)
-    if elem in cousins:
-        cousins.remove(elem)
-    return cousins
 
 
-def get_second_level_descendants(elem):
-    for first_level_assoc in elem.incoming:
-        for second_level_assoc in first_level_assoc.fromElement.incoming:
-            yield second_level_assoc.fromElement
+def find_kids_with_cousins(graph, persons=None):
+    index = as_index(graph)
+    second_level_descendants_dict: Dict[int, Set[int]] = {}
+    second_level_ancestors_dict: Dict[int, Set[int]] = {}
+    selected = None if persons is None else set(persons)
 
-
-def get_second_level_ancestors(elem):
-    for first_level_assoc in elem.outgoing:
-        for second_level_assoc in first_level_assoc.fromElement.outgoing:
-            yield second_level_assoc.toElement
-
-
-def find_kids_with_cousins(graph):
-    second_level_descendants_dict: Dict[SElement, Set[SElement]] = {}
-    second_level_ancestors_dict: Dict[SElement, Set[SElement]] = {}
-
-    for elem in graph.rootNode.children:
-        second_level_descendants_dict[elem] = set(get_second_level_descendants(elem))
-    for elem in graph.rootNode.children:
-        second_level_ancestors_dict[elem] = set(get_second_level_ancestors(elem))
-
-    for elem in graph.rootNode.children:
-        children = []
-        for child_assoc in elem.incoming:
-            children.append(child_assoc.fromElement)
+    for i in selected_persons(index, persons):
+        children = set(index.children(i))
 
         if children:
-            for cousin in get_cousins(elem, second_level_ancestors_dict,
+            second_level_ancestors_dict[i] = set(get_second_level_ancestors(index, i))
+            for ancestor in second_level_ancestors_dict[i]:
+                if ancestor not in second_level_descendants_dict:
+                    second_level_descendants_dict[ancestor] = set(
+                        get_second_level_descendants(index, ancestor))
+            for cousin in get_cousins(i, second_level_ancestors_dict,
                                       second_level_descendants_dict):
-                common = []
+                # Each pair once, from the smaller id unless only the bigger one is checked
+                if cousin < i and (selected is None or cousin in selected):
+                    continue
+                a, b = sorted((i, cousin))
                 # find out commin children with the cousin
-                for cousin_child_assoc in cousin.incoming:
-                    if cousin_child_assoc.fromElement in children:
-                        common.append(cousin_child_assoc.fromElement)
+                common = [x for x in index.children(cousin) if x in children]
                 if common:
-                    print(f'Common children with cousins {elem.name} {cousin.name}:')
+                    print(f'Common children with cousins {index.names[a]} {index.names[b]}:')
+                    report_issue('find_kids_with_cousins', f'Common children with cousins '
+                                 f'{index.names[a]} {index.names[b]}',
+                                 [a, b, *common], 'warning')
                 for common_child in common:
-                    print(f'    {common_child.name}')
+                    print(f'    {index.names[common_child]}')
 
 
 # Find cousin marriages
 
 
-def find_parent_is_a_sibling_and_other_stuff(graph):
-    issues = []
-    for elem in graph.rootNode.children:
-        parents = []
-        for parent_assoc in elem.outgoing:
-            parents.append(parent_assoc.toElement)
-
-        for parent_assoc in elem.outgoing:
-            for pparent_assoc in parent_assoc.toElement.outgoing:
-                if pparent_assoc.toElement in parents:
-                    issues.append((elem, parents))
-
-    if issues:
-        print('Found issues with parent == parents.parent')
-        for issue in issues:
-            print(issue)
-
-
-def verify_basic_natural_requirements(graph):
-    # Verify
-    for x in graph.rootNode.children:
-        if len(x.outgoing) > 2:
-            raise Exception(
-                f'Invalid combination, three parents: {x.name}\n  {[x.toElement.name for x in x.outgoing]}')
-
-    # verify_counts
-    for elem in graph.rootNode.children:
-        if len(elem.outgoing) > 2:
-            raise Exception(f'Element cannot have more than 2 parents here: {elem.name}'
-                            f'  Parents: {" ".join(elem.outgoing)}')
-
-    # verify structure
-    for elem in graph.rootNode.children:
-        if elem.children:
-            raise Exception(f'Element {elem.name} has children: {elem.children[0].name}')
-
-
-def verify_subgraphs(graph):
-    def verify_n_connections(node, n):
-        found = []
-        stack = [node]
-        handled = set()
-        while stack:
-            elem = stack.pop(0)
-            if elem in handled:
-                continue
-            handled.add(elem)
-            for i in elem.incoming:
-                found.append(i.fromElement)
-                stack.append(i.toElement)
-            for i in elem.outgoing:
-                found.append(i.toElement)
-                stack.append(i.toElement)
-            if len(found) > n:
-                return
-
-    for node in graph.rootNode.children:
-        verify_n_connections(node, 5)
-
-
-def verify_common_parents_with_children_counts(graph):
-    for node in graph.rootNode.children:
-        if node.incoming:
-            children = [x.fromElement for x in node.incoming]
-            parents_ea_list = [child.outgoing for child in children]
-            parents = set([item.toElement for sublist in parents_ea_list for item in sublist])
-            parents.remove(node)
-            if len(parents) > 3:
-                raise Exception('Suspiciously high number of common parents, must be an error\n')
-            elif len(parents) > 2:
-                sys.stderr.write('Suspiciously high number of common parents: \n')
-                parents_names = set([item.toElement.name for sublist in parents_ea_list for item in sublist])
-                sys.stderr.write(str(parents_names) + '\n')
-            elif len(parents) > 1:
-                print(f'{node.name} has {len(children)} children who have {len(parents)} other '
-                      f'parents: ')
-                for parent in parents:
-                    print(f'   {parent.name}  kids: {len(parent.incoming)}')
-
-
-def find_cousin_marriages(graph, level):
-    # this --> parent --> grandparent --> grandgrandparent has multiple matches
-
-    def traverse_1(original_element, element, paths_per_grand_grand_grand_parents, path, level):
-        path.append(element)
-        if level - 1 > 0:
-            for parent in element.outgoing:
-                traverse_1(original_element, parent.toElement, paths_per_grand_grand_grand_parents,
-                           path, level - 1)
-        else:
-            paths_per_grand_grand_grand_parents.setdefault(element, []).append(list(path))
-
-        path.pop(len(path) - 1)
-
-    for original_element in graph.rootNode.children:
-        paths_per_grand_grand_grand_parents: Dict[SElement, List[List[SElement]]] = {}
-        path = []
-        for parent_ea in original_element.outgoing:
-            path.append(parent_ea.toElement)
-            for grandparent_ea in parent_ea.toElement.outgoing:
-                path.append(grandparent_ea.toElement)
-                for grandgrandparent_ea in grandparent_ea.toElement.outgoing:
-                    traverse_1(original_element, grandgrandparent_ea.toElement,
-                               paths_per_grand_grand_grand_parents, path, level)
-                path.pop(len(path) - 1)
-            path.pop(len(path) - 1)
-
-        if paths_per_grand_grand_grand_parents:
-            found = False
-            for k, paths in paths_per_grand_grand_grand_parents.items():
-                if len(paths) > 1:
-                    first_elements = set()
-                    for path in paths:
-                        first_elements.add(path[0])
-                    if len(first_elements) == 1:
-                        continue
-
-                    found = True
-                    break
-
-            if found:
-                name_cleaned = original_element.name.split('\n')[0]
-                print(
-                    f'Parents of {name_cleaned.split()[0]} are {level}. cousins due to common ancestor.')
-                print(f'  Child: ' + name_cleaned)
-                print(f'   Parents:')
-                for parent_ea in original_element.outgoing:
-                    print(f'        {parent_ea.toElement.name}')
-
-        for k, paths in paths_per_grand_grand_grand_parents.items():
-            if len(paths) > 1:
-                # Ignore those cases where
-                first_elements = set()
-                for path in paths:
-                    first_elements.add(path[0])
-                if len(first_elements) == 1:
-                    continue
+def find_parent_is_a_sibling_and_other_stuff(graph, persons=None):
+    run_person_rules(graph, [ParentIsASiblingRule()], persons)
+
+
+def verify_basic_natural_requirements(graph, persons=None):
+    run_person_rules(graph, [BasicNaturalRequirementsRule()], persons)
+
+
+def verify_common_parents_with_children_counts(graph, persons=None):
+    run_person_rules(graph, [CommonParentsWithChildrenCountsRule()], persons)
+
+
+def find_cousin_marriages(graph, level, persons=None):
+    # The parents of a child are level. cousins when a path of level + 1 generations up from
+    # two of them leads to the same ancestor, whether or not they are also related closer.
+    index = as_index(graph)
+
+    for original in selected_persons(index, persons):
+        parents = distinct_parents(index, original)
+        if len(parents) < 2:
+            continue
+        # ancestor -> paths up to it, one from each parent reaching it
+        paths = {}
+        for parent in parents:
+            for k, path in ancestors_at(index, parent, level + 1).items():
+                paths.setdefault(k, []).append(path)
+        common_ancestors = sorted(k for k, k_paths in paths.items() if len(k_paths) > 1)
+        if not common_ancestors:
+            continue
+
+        name_cleaned = index.names[original].split('\n')[0]
+        print(f'Parents of {name_cleaned.split()[0]} are {level}. cousins due to common ancestor.')
+        print(f'  Child: ' + name_cleaned)
+        print(f'   Parents:')
+        for parent in index.parents(original):
+            print(f'        {index.names[parent]}')
+
+        for k in common_ancestors:
+            ancestor_name = index.names[k].replace('\n', ' ').strip()
+            print(f'              Common ancestor: {ancestor_name}')
+            print('              Paths:')
+            for path in paths[k]:
+                print('                   ' + ' => '.join(
+                    map(lambda x: index.names[x].split('\n')[0], path)))
+            report_issue('find_cousin_marriages', f'Parents of {name_cleaned} are {level}. '
+                         f'cousins due to common ancestor {ancestor_name}',
+                         [original, *[path[0] for path in paths[k]], k], 'info')
+
 
-                ancestor_name = k.name.replace('\n', ' ').strip()
-                print(f'              Common ancestor: {ancestor_name}')
-
-                if level > 0:
-                    print('              Paths:')
-                    for path_to_same_anc in paths:
-                        print('                   ' + ' => '.join(
-                            map(lambda x: x.name.split('\n')[0], path_to_same_anc)))
-
-    return
-
-
-def find_getting_child_with_parent(graph, known_problem_cases):
-    for node in graph.rootNode.children:
-        children = [x.fromElement for x in node.incoming]
-        parents = [x.toElement for x in node.outgoing]
-        for child in children:
-            for parent_of_child_ea in child.outgoing:
-                if parent_of_child_ea.toElement in parents:
-                    accepted = False
-                    for known in known_problem_cases:
-                        if known in node.name or known in parent_of_child_ea.toElement.name:
-                            accepted = True
-                            break
-                    if not accepted:
-                        raise Exception(f'Child with a parent: {node.name} '
-                                        f'parent={parent_of_child_ea.toElement.name}')
-
-
-def find_if_parents_parent_is_parent(graph, known_problem_cases):
-    for node in graph.rootNode.children:
-        parents = [x.toElement for x in node.outgoing]
-        for ea_parent in node.outgoing:
-            for ea_parents_parent in ea_parent.toElement.outgoing:
-                accepted = False
-                for known in known_problem_cases:
-                    if known in node.name or known in ea_parents_parent.toElement.name:
-                        accepted = True
-                        break
-                if accepted:
-                    continue
 
-                if ea_parents_parent.toElement in parents:
-                    raise Exception(f'Parent\'s parent {ea_parents_parent.toElement.name} is parent for'
-                                    f' {node.name}.')
-                """
-                TODO!!!!!  Anna Enygeus bint Joseph is parent for Caradog ap Bran
-                for ea_parents_parents_parent in ea_parents_parent.toElement.outgoing:
-                    if ea_parents_parents_parent.toElement in parents:
-                        raise Exception(f'Parent\'s parent\'s parent '
-                                        f'{ea_parents_parents_parent.toElement.name} is parent '
-                                        f'for {node.name}.')
-                """
+def find_getting_child_with_parent(graph, known_problem_cases, persons=None):
+    run_person_rules(graph, [ChildWithParentRule(known_problem_cases)], persons)
 
 
-def find_if_name_startswith_someones_elses_name(graph):
+def find_if_name_startswith_someones_elses_name(graph, persons=None):
+    index = as_index(graph)
+    if persons is not None:
+        return report_name_prefix_issues(index, find_name_prefixes_of(index, persons))
+
+    # Names that start with another name sit right after it in sorted order, so only the
+    # following run of names sharing the prefix needs to be scanned.
+    sorted_names = index.sorted_names()
+    found = []
+    compared = 0
+    for pos, (prefix, prefix_i) in enumerate(sorted_names):
+        for next_pos in range(pos + 1, len(sorted_names)):
+            name, i = sorted_names[next_pos]
+            compared += 1
+            if not name.startswith(prefix):
+                break
+            found.append((i, prefix_i))
+            if name == prefix:
+                found.append((prefix_i, i))
+    count('pairs compared', compared)
+
+    return report_name_prefix_issues(index, found)
+
+
+def find_name_prefixes_of(index, persons):
+    # Pairs where one of the given persons is either the prefix or the full name
+    found = set()
+    for person in persons:
+        name = index.names[person]
+        for i in index.ids_with_prefix(name):
+            if i != person:
+                found.add((i, person))
+        for end in range(1, len(name) + 1):
+            for prefix_i in index.ids_named(name[:end]):
+                if prefix_i != person:
+                    found.add((person, prefix_i))
+    return list(found)
+
+
+def report_name_prefix_issues(index, found):
+    # Report in the same order as a pairwise scan over the children would.
+    found.sort()
     issues = []
-    for node in graph.rootNode.children:
-        for node2 in graph.rootNode.children:
-            if node != node2 and node.name.startswith(node2.name):
-                sys.stderr.write(
-                    'Name starts with someone else\'s name: ' + node2.name + '  --- ' + node.name + '\n\n')
-                issues.append((node2.name, node.name))
+    for i, prefix_i in found:
+        sys.stderr.write('Name starts with someone else\'s name: ' + index.names[prefix_i] +
+                         '  --- ' + index.names[i] + '\n\n')
+        report_issue('find_if_name_startswith_someones_elses_name',
+                     'Name starts with someone else\'s name: ' + index.names[prefix_i] +
+                     '  --- ' + index.names[i], [prefix_i, i], 'warning')
+        issues.append((index.names[prefix_i], index.names[i]))
     return issues
 
 
-def detect_duplicate_persons_based_on_name_and_year(graph):
+person_name_and_year_of_birth_pattern = re.compile('^([A-ZÅÄÖa-zåäö ]+-?[12][0-9][0-9][0-9])')
+
+
+def detect_duplicate_persons_based_on_name_and_year(graph, persons=None):
+    index = as_index(graph)
     # See if there are suspiciously similar persons
     identifier_to_persons = {}
-    person_name_and_year_of_birth_pattern = re.compile('^([A-ZÅÄÖa-zåäö ]+-?[12][0-9][0-9][0-9])')
-    for person in graph.rootNode.children:
-        identifier = person_name_and_year_of_birth_pattern.search(person.name)
+    candidates = selected_persons(index, persons)
+    if persons is not None:
+        # The identifier is a prefix of the name, so its other holders share that prefix.
+        candidates = set(candidates)
+        for i in persons:
+            identifier = person_name_and_year_of_birth_pattern.search(index.names[i])
+            if identifier:
+                candidates.update(index.ids_with_prefix(identifier.group(1)))
+        candidates = sorted(candidates)
+    for i in candidates:
+        identifier = person_name_and_year_of_birth_pattern.search(index.names[i])
         if identifier:
-            identifier_to_persons.setdefault(identifier.group(1), []).append(person)
+            identifier_to_persons.setdefault(identifier.group(1), []).append(i)
+    count('regex evaluations', len(candidates) + (len(persons) if persons is not None else 0))
 
-    def abbrev_deps(person):
+    def abbrev_deps(i):
         s = ''
-        for ea in person.incoming:
-            s += ea.fromElement.name[0]
-        for ea in person.outgoing:
-            s += ea.fromElement.name[0]
+        for child in index.children(i):
+            s += index.names[child][0]
+        for parent in index.parents(i):
+            s += index.names[parent][0]
         return s
 
     for k, v in identifier_to_persons.items():
         if len(v) > 1:
             print('\nSuspiciously similar person identifiers')
-            for person in v:
-                print(f'    <{person.name}>  {abbrev_deps(person)} ')
-
-
-def verify_unique_names(graph):
-    names = set()
-    for element in graph.rootNode.children:
-        if element.name in names:
-            raise Exception('Non-unique names: ' + element.name)
-        names.add(element.name)
-
-
-def look_for_very_similar_persons(graph, exceptions_allowed):
-    pat = re.compile(
-        '([12][0-9][0-9][0-9]+) [A-Za-zÅÄÖåäö, ]+ K. ([12][0-9][0-9][0-9]) [A-Za-zÅÄÖåäö, ]+')
-    for elem1 in graph.rootNode.children:
-        name1 = elem1.name
-        m1 = None
-        if ' K.' in name1:
-            m1 = pat.search(name1)
-            if m1:
-                for elem2 in graph.rootNode.children:
-                    if elem1 != elem2:
-                        name2 = elem2.name
-                        if ' K. ' in name2 and m1.group(1) in name2:
-                            m2 = pat.search(name2)
-                            if m2:
-                                if m1.group(1) == m2.group(1) and m1.group(2) == m2.group(2):
-                                    if name1[0:8] == name2[0:8] and not name1 in exceptions_allowed:
-                                        msg = 'Same lifespan:\n    "' + name1 + '"\n    "' + name2 + '"'
-                                        raise Exception(msg)
-
-
-def find_closest_linked_ancestor_without_necessary_details(graph, check_level=8):
+            for i in v:
+                print(f'    <{index.names[i]}>  {abbrev_deps(i)} ')
+            report_issue('detect_duplicate_persons_based_on_name_and_year',
+                         f'Suspiciously similar person identifiers: {k}', v, 'warning')
+
+
+def verify_unique_names(graph, persons=None):
+    run_person_rules(graph, [UniqueNamesRule()], persons)
+
+
+lifespan_pat = re.compile(
+    '([12][0-9][0-9][0-9]+) [A-Za-zÅÄÖåäö, ]+ K. ([12][0-9][0-9][0-9]) [A-Za-zÅÄÖåäö, ]+')
+
+
+def lifespan_key(name):
+    if ' K.' in name:
+        m = lifespan_pat.search(name)
+        if m:
+            return m.group(1), m.group(2), name[0:8]
+    return None
+
+
+def look_for_very_similar_persons(graph, exceptions_allowed, persons=None):
+    index = as_index(graph)
+
+    # Parse every name once and bucket by (birth year, death year, first 8 chars), so only
+    # persons sharing a bucket need to be compared with each other. For a subset of persons
+    # only the names sharing their first 8 chars can end up in the same buckets.
+    candidates = selected_persons(index, persons)
+    if persons is not None:
+        candidates = sorted(set(j for i in candidates
+                                for j in index.ids_with_prefix(index.names[i][0:8])))
+    buckets = {}
+    keys = []
+    for i in candidates:
+        key = lifespan_key(index.names[i])
+        if key is not None:
+            buckets.setdefault(key, []).append(i)
+        keys.append((i, key))
+
+    reported = set()
+    for i, key in keys:
+        if key is None or len(buckets[key]) < 2:
+            continue
+        count('pairs compared', len(buckets[key]) - 1)
+        name1 = index.names[i]
+        if name1 in exceptions_allowed:
+            continue
+        for j in buckets[key]:
+            name2 = index.names[j]
+            if i != j and ' K. ' in name2 and (j, i) not in reported:
+                reported.add((i, j))
+                msg = 'Same lifespan:\n    "' + name1 + '"\n    "' + name2 + '"'
+                report_issue('look_for_very_similar_persons', msg, [i, j])
+
+
+def find_closest_linked_ancestor_without_necessary_details(graph, check_level=8, persons=None):
+    index = as_index(graph)
     # Show closest linked that have
     #  - no parents
     #  - no birth year
     #  - no place of birth
-    without_two_parents = [x for x in graph.rootNode.children if len(x.outgoing) < 2]
-
-    def collect_descendants(person, current):
-        out = []
-        for ea in person.incoming:
-            current_2 = copy.copy(current)
-            current_2.append(person)
-            persons = collect_descendants(ea.fromElement, current_2)
-            out.extend(persons)
-
-        if out:
-            return out
-
-        if not person.incoming:
-            return [current + [person]]
-
-    def show_mystery(person):
-        descendants = collect_descendants(person, [])
-        matches = False
-        for d in descendants:
-            if len(d) < check_level:
-                matches = True
-                break
-
-        if not matches:
+    without_two_parents = [i for i in selected_persons(index, persons)
+                           if index.parent_count(i) < 2]
+    # Only leaves fewer than check_level - 1 generations down are shown
+    distances, next_hops = leaf_distances(
+        index, None if persons is None else without_two_parents, check_level - 2)
+
+    def show_mystery(i):
+        # Only ancestors linked within check_level generations to someone without children
+        if distances[i] < 1 or distances[i] + 1 >= check_level:
             return
 
-        d_list = set()
-        d = None
-        for d in descendants:
-            d_list.add(d[-1].name)
-        print(person.name.replace('\n', '\n  '))
-        if re.search('[12][0-9][0-9][0-9]', d[1].name):
-            print('     ' + descendants[0][1].name.replace('\n', ' '))
-        else:
-            print('     ' + descendants[0][1].name.replace('\n', ' '))
-            print('         ' + descendants[0][2].name.replace('\n', ' '))
-        print('                     .... ' + str(d_list))
+        path = path_to_leaf(next_hops, i)
+        print(index.names[i].replace('\n', '\n  '))
+        print('     ' + index.names[path[1]].replace('\n', ' '))
+        if len(path) > 2 and not re.search('[12][0-9][0-9][0-9]', index.names[path[1]]):
+            print('         ' + index.names[path[2]].replace('\n', ' '))
+        print('                     .... ' + index.names[path[-1]].replace('\n', ' '))
         print('')
+        report_issue('find_closest_linked_ancestor_without_necessary_details',
+                     'Closest linked ancestor without necessary details: ' +
+                     index.names[i].split('\n')[0], path, 'info')
 
     recent_year_pat = re.compile(' 1[89][0-9][0-9]')
     other_year_pat = re.compile(' 1[76543210][0-9][0-9]')
-    for elem in without_two_parents:
-        if recent_year_pat.search(elem.name):
+    for i in without_two_parents:
+        if recent_year_pat.search(index.names[i]):
             pass  # todo print(elem.name)
-        elif other_year_pat.search(elem.name):
+        elif other_year_pat.search(index.names[i]):
             pass
         else:
-            show_mystery(elem)
+            show_mystery(i)
 
 
 num_dash_num_pat = re.compile(r'[0-9]-[0-9]')
@@ -391,15 +313,16 @@ year_digits_pat = re.compile(r'-?[1-2][0-9][0-9][0-9]')
 
 
 def check_naming_conventions(graph):
-    verify_description_duplication(graph)
+    index = as_index(graph)
+    verify_description_duplication(index)
 
-    for node in graph.rootNode.children:
-        lines = node.name.split('\n')
+    for name, attrs in zip(index.names, index.attrs):
+        lines = name.split('\n')
         if '"' in lines[0]:
             raise Exception(
-                'First row should not contain double quotes ("):    ' + node.name.split('\n')[0])
+                'First row should not contain double quotes ("):    ' + lines[0])
         if len(lines[0].split('(')) > 2:
-            raise Exception('First row should not contain several parenthesis:  ' + node.name)
+            raise Exception('First row should not contain several parenthesis:  ' + name)
         if ' K. ' not in lines[0]:
             # Basic number check
             if ' 1' in lines[0]:
@@ -417,7 +340,7 @@ def check_naming_conventions(graph):
             if '  ' in right_part:
                 raise Exception(f'Double space in K. part: "{right_part}"\n{lines[0]}')
         if len(lines) > 1 and lines[1].startswith('K. '):
-            raise Exception('Node second line starts with K.  :' + node.name)
+            raise Exception('Node second line starts with K.  :' + name)
         m = num_dash_num_pat.search(lines[0])
         if m:
             pos_a = lines[0].find(' arviolta')
@@ -425,62 +348,115 @@ def check_naming_conventions(graph):
                 pos_a = -1
             if pos_a == -1:
                 raise Exception('Year range needs keyword arviolta, name=           ' + lines[0])
-        if 'description' in node.attrs and '**' not in node.name:
-            conditional_raise('Not using ** for description: ' + node.name)
-        if 'description' not in node.attrs and '**' in node.name:
-            conditional_raise('using ** without description: ' + node.name)
+        if 'description' in attrs and '**' not in name:
+            conditional_raise('Not using ** for description: ' + name)
+        if 'description' not in attrs and '**' in name:
+            conditional_raise('using ** without description: ' + name)
 
 
 def verify_description_duplication(graph):
+    index = as_index(graph)
     desc_map = {}
-    for node in graph.rootNode.children:
-        if 'description' in node.attrs:
-            desc_map.setdefault(node.attrs.get('description'), []).append(node)
+    for name, attrs in zip(index.names, index.attrs):
+        if 'description' in attrs:
+            desc_map.setdefault(attrs.get('description'), []).append(name)
     for k, v in desc_map.items():
         if len(v) > 1:
             print('Duplicated descriptions found for: ')
-            for vv in v:
-                print(vv.name)
+            for name in v:
+                print(name)
 
             print('Desc:')
             print('   ' + k)
             raise Exception('Stopping on duplicated descs.')
 
 
-def verify_graph(graph, verbose=False, known_problem_cases=None):
-    verify_unique_names(graph)
-    verify_basic_natural_requirements(graph)
-    find_parent_is_a_sibling_and_other_stuff(graph)
-    detect_duplicate_persons_based_on_name_and_year(graph)
-    find_getting_child_with_parent(graph, known_problem_cases)
-    find_if_parents_parent_is_parent(graph, known_problem_cases)
-    name_issues = find_if_name_startswith_someones_elses_name(graph)
-    find_kids_with_cousins(graph)
+def verification_checks(known_problem_cases=None, exceptions_allowed_for_similar_persons=None):
+    # (name, check, extra args) in the order verify_graph runs them. Every check only reads
+    # the index, so they can also be run concurrently.
+    return [
+        ('person_rules', run_person_rules, (default_person_rules(known_problem_cases),)),
+        ('find_ancestor_cycles', find_ancestor_cycles, (known_problem_cases,)),
+        ('find_if_parents_parent_is_parent', find_if_parents_parent_is_parent,
+         (known_problem_cases,)),
+        ('detect_duplicate_persons_based_on_name_and_year',
+         detect_duplicate_persons_based_on_name_and_year, ()),
+        ('report_duplicate_candidates', report_duplicate_candidates, ()),
+        ('find_if_name_startswith_someones_elses_name',
+         find_if_name_startswith_someones_elses_name, ()),
+        ('find_kids_with_cousins', find_kids_with_cousins, ()),
+        ('verify_birth_years', verify_birth_years, ()),
+        ('verify_components', verify_components, ()),
+        ('look_for_very_similar_persons', look_for_very_similar_persons,
+         (exceptions_allowed_for_similar_persons or (),)),
+        ('find_closest_linked_ancestor_without_necessary_details',
+         find_closest_linked_ancestor_without_necessary_details, ()),
+        # Todo check also missing details
+        # todo here check genders also
+
+        # TODO !!!!!!!!! avoid now
+        #  check_naming_conventions(graph)
+    ]
+
+
+# Checks that only follow parent and child links from each person. Connected components
+# never share findings of these, so each component can be verified on its own.
+COMPONENT_LOCAL_CHECKS = {'find_ancestor_cycles', 'find_if_parents_parent_is_parent',
+                          'find_kids_with_cousins', 'verify_birth_years',
+                          'find_closest_linked_ancestor_without_necessary_details'}
+
+
+def split_verification_checks(known_problem_cases=None,
+                              exceptions_allowed_for_similar_persons=None):
+    """The checks of verification_checks as (whole graph checks, per component checks).
+
+    The person rules are split too, unique names need all names and the others are local.
+    """
+    whole_graph_checks = [('verify_unique_names', verify_unique_names, ())]
+    local_rules = [rule for rule in default_person_rules(known_problem_cases)
+                   if not isinstance(rule, UniqueNamesRule)]
+    component_checks = [('person_rules', run_person_rules, (local_rules,))]
+    for name, check, args in verification_checks(known_problem_cases,
+                                                 exceptions_allowed_for_similar_persons):
+        if name in COMPONENT_LOCAL_CHECKS:
+            component_checks.append((name, check, args))
+        elif name != 'person_rules':
+            whole_graph_checks.append((name, check, args))
+    return whole_graph_checks, component_checks
+
+
+def verify_graph(graph, verbose=False, known_problem_cases=None,
+                 exceptions_allowed_for_similar_persons=None):
+    # Build the compact index once and run every check against it.
+    index = as_index(graph)
+
+    results = {}
+    for name, check, args in verification_checks(known_problem_cases,
+                                                 exceptions_allowed_for_similar_persons):
+        with timed(name):
+            results[name] = check(index, *args)
+    drop_year_of_birth(index)
 
-    [x.attrs.pop('year_of_birth') for x in graph.rootNode.children if 'year_of_birth' in x.attrs]
+    if verbose:
+        report_related_persons(index)
 
-    # TODO !!!! verify_birth_years(graph)
-    verify_subgraphs(graph)
-    verify_common_parents_with_children_counts(graph)
+    return results['find_if_name_startswith_someones_elses_name']
 
-    verbose = False  # TODO !!!!!
 
-    if verbose:
-        find_cousin_marriages(graph, 1)
+def report_related_persons(graph):
+    """Print cousin marriages up to 4 levels and the pedigree collapse of related parents."""
+    index = as_index(graph)
+    with timed('report_related_persons'):
+        find_cousin_marriages(index, 1)
         print('Cousins at 2 level\n============================================0\n')
-        find_cousin_marriages(graph, 2)
-        # find_cousin_marriages(graph, 3)
-        # find_cousin_marriages(graph, 4)
-
-    # TODO !!!!!!!!! avoid now
-    # look_for_very_similar_persons(graph, exceptions_allowed_for_similar_persons)
-    # TODO find_closest_linked_ancestor_without_necessary_details(graph)
-    # Todo check also missing details
-    # todo here check genders also
-
-    # TODO !!!!!!!!! avoid now
-    #  check_naming_conventions(graph)
-    return name_issues
+        find_cousin_marriages(index, 2)
+        find_cousin_marriages(index, 3)
+        find_cousin_marriages(index, 4)
+        find_related_parents(index, 10)
 
 # Check all the children who have two parents to see if the rest of the children in the same
 # family don't have 2 parents. Hmm. Not maybe useful info since it is fairly possible.
+
+
+if __name__ == '__main__':
+    verify_graph(load_index_cached(sys.argv[1]))
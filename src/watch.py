@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+from except_utils import collecting_issues
+from graph_cache import parse_graph_file
+from incremental import carry_over_issues, verify_graph_incremental
+from pedigree_index import PedigreeIndex
+from verifier import verify_graph
+
+
+class Watcher:
+    """Keeps the last verified graph in memory and reverifies when the input file changes."""
+
+    def __init__(self, a, b=None, full=False):
+        self.a = a
+        self.b = b
+        self.full = full
+        self.index = None
+        self.stamp = None
+        # Text and JSON Lines issues of the latest run, as served to clients
+        self.report = ''
+        self.issues = ''
+        # Issues standing after the latest run, the new ones and those carried over
+        self.found = []
+        self.lock = threading.Lock()
+
+    def file_stamp(self):
+        try:
+            st = os.stat(self.a)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def changed(self, settle=0.2):
+        # A file still being written keeps changing, wait until it stays the same
+        stamp = self.file_stamp()
+        if stamp is None or stamp == self.stamp:
+            return False
+        time.sleep(settle)
+        if self.file_stamp() != stamp:
+            return False
+        self.stamp = stamp
+        return True
+
+    def run_once(self):
+        start = time.perf_counter()
+        out = io.StringIO()
+        issues = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            try:
+                graph = parse_graph_file(self.a)
+                if self.b:
+                    graph.to_xml(fname=self.b)
+                index = PedigreeIndex.from_sgraph(graph)
+                carried = []
+                with collecting_issues() as collector:
+                    if self.index is None or self.full:
+                        verify_graph(index)
+                    else:
+                        verify_graph_incremental(self.index, index)
+                        # The persons not checked again keep their issues from before
+                        new = {(issue.check, issue.message) for issue in collector.issues}
+                        carried = [issue for issue in
+                                   carry_over_issues(self.index, index, self.found)
+                                   if (issue.check, issue.message) not in new]
+                if carried:
+                    print(f'\n{len(carried)} issues carried over from the previous run:')
+                    for issue in carried:
+                        print(f'  {issue.severity} {issue.check}: {issue.message}')
+                self.index = index
+                self.found = collector.issues + carried
+                for issue in self.found:
+                    issues.write(json.dumps(issue._asdict(), ensure_ascii=False) + '\n')
+                errors = sum(issue.severity == 'error' for issue in self.found)
+                print(f'\n{len(self.found)} issues, {errors} errors, verified in '
+                      f'{time.perf_counter() - start:.2f} s')
+            except Exception:
+                traceback.print_exc(file=out)
+        header = f'==== {time.strftime("%H:%M:%S")} {self.a}\n'
+        with self.lock:
+            self.report = header + out.getvalue()
+            self.issues = issues.getvalue()
+        return self.report
+
+    def watch(self, interval=1.0, quiet=False):
+        while True:
+            if self.changed():
+                report = self.run_once()
+                if not quiet:
+                    sys.stdout.write(report)
+                    sys.stdout.flush()
+            time.sleep(interval)
+
+
+def serve_reports(watcher, port):
+    """Serve the latest report on localhost:port, the issues as JSON Lines after a line 'issues'."""
+
+    class ReportHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = self.rfile.readline().strip()
+            with watcher.lock:
+                text = watcher.issues if request == b'issues' else watcher.report
+            self.wfile.write(text.encode('utf-8'))
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', port), ReportHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep a graph in memory and verify it again '
+                                                 'whenever the file changes.')
+    parser.add_argument('a', help='input file, GraphML or sgraph XML')
+    parser.add_argument('b', nargs='?', help='sgraph XML output file written on every change')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls')
+    parser.add_argument('--port', type=int,
+                        help='serve the latest report on this localhost port')
+    parser.add_argument('--full', action='store_true',
+                        help='verify the whole graph on every change instead of only the '
+                             'persons changed since the previous version')
+    parser.add_argument('--quiet', action='store_true', help='do not print the reports')
+    args = parser.parse_args()
+
+    watcher = Watcher(args.a, args.b, args.full)
+    if args.port:
+        serve_reports(watcher, args.port)
+    try:
+        watcher.watch(args.interval, args.quiet)
+    except KeyboardInterrupt:
+        pass
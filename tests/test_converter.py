@@ -0,0 +1,16 @@
+import pytest
+
+from converter import batch_jobs
+
+
+def test_batch_rejects_inputs_with_the_same_output(tmp_path):
+    source = tmp_path / 'in'
+    source.mkdir()
+    for name in ('a.graphml', 'a.ged', 'b.xml'):
+        (source / name).write_text('')
+    with pytest.raises(Exception, match='a.xml from .*a.ged, .*a.graphml'):
+        batch_jobs(str(source), str(tmp_path / 'out'))
+
+    (source / 'a.ged').unlink()
+    assert [b for _, b in batch_jobs(str(source), str(tmp_path / 'out'))] == \
+        [str(tmp_path / 'out' / 'a.xml'), str(tmp_path / 'out' / 'b.graphml')]
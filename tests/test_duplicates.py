@@ -0,0 +1,8 @@
+from duplicates import phonetic_key
+
+
+def test_patronymics_share_a_key_with_double_letters():
+    assert phonetic_key('Mattsson') == phonetic_key('Matinpoika') == 'matiasson'
+    assert phonetic_key('Mattsdotter') == phonetic_key('Matsdoter') == \
+        phonetic_key('Matintytär') == 'matiasdotter'
+    assert phonetic_key('Juhonpoika') == phonetic_key('Johansson')
@@ -0,0 +1,24 @@
+from sgraph import SElement
+
+from gedcom import read_gedcom, write_gedcom
+from pedigree_index import PedigreeIndex
+from synthetic import generate_pedigree
+
+
+def index_summary(index):
+    return (list(index.names), [list(index.parents(i)) for i in range(len(index))],
+            list(index.attrs), index.nested)
+
+
+def test_gedcom_reads_the_graph_it_was_written_from(tmp_path):
+    for seed in range(3):
+        graph = generate_pedigree(300, seed, descriptions=0.2)
+        persons = graph.rootNode.children
+        persons[0].name += '\nsecond line\nÄijälä'
+        persons[1].attrs['description'] = 'long ' * 100
+        persons[2].attrs['source'] = 'parish register'
+        SElement(persons[3], 'nested note')
+        index = PedigreeIndex.from_sgraph(graph)
+        path = str(tmp_path / f'{seed}.ged')
+        write_gedcom(index, path)
+        assert index_summary(read_gedcom(path)) == index_summary(index)
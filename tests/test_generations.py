@@ -0,0 +1,44 @@
+import random
+
+from except_utils import collecting_issues
+from generations import find_ancestor_cycles, find_cycles, generation_numbers
+from pedigree_index import PedigreeIndex
+
+
+def index_of(parents):
+    names = [f'P{i}' for i in range(len(parents))]
+    return PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+
+
+def test_cycle_with_outside_parent():
+    # A and B are each other's parents and B also has the parent C
+    index = index_of([[1], [0, 2], []])
+    order, generations = generation_numbers(index)
+    assert order == [2]
+    assert list(generations) == [-1, -1, 0]
+    assert find_cycles(index) == [[0, 1]]
+    with collecting_issues() as collector:
+        find_ancestor_cycles(index)
+    assert [issue.persons for issue in collector.issues] == [[0, 1]]
+
+
+def test_descendants_of_cycle_are_not_numbered():
+    index = index_of([[1], [0, 2], [], [0, 2], [3]])
+    generations = generation_numbers(index)[1]
+    assert list(generations) == [-1, -1, 0, -1, -1]
+    assert find_cycles(index) == [[0, 1]]
+
+
+def test_random_cyclic_graphs():
+    for seed in range(50):
+        rnd = random.Random(seed)
+        parents = [rnd.sample(range(15), rnd.randint(0, 2)) for _ in range(15)]
+        parents = [[p for p in ps if p != i] for i, ps in enumerate(parents)]
+        index = index_of(parents)
+        generations = generation_numbers(index)[1]
+        for i, ps in enumerate(parents):
+            if generations[i] != -1:
+                assert all(-1 < generations[p] < generations[i] for p in ps)
+        for cycle in find_cycles(index):
+            for child, parent in zip(cycle, cycle[1:] + cycle[:1]):
+                assert parent in parents[child]
@@ -0,0 +1,27 @@
+from sgraph import SElement
+
+from graph_cache import load_index_cache, write_index_cache
+from pedigree_index import PedigreeIndex
+from synthetic import generate_pedigree
+
+
+def index_summary(index):
+    return (list(index.names), [list(index.parents(i)) for i in range(len(index))],
+            [list(index.children(i)) for i in range(len(index))], list(index.attrs),
+            index.nested)
+
+
+def test_cache_loads_the_index_it_was_written_from(tmp_path):
+    for seed in range(3):
+        graph = generate_pedigree(300, seed, descriptions=0.2)
+        persons = graph.rootNode.children
+        persons[0].name = 'Äijälä Jääskeläinen 1500\nsecond line'
+        SElement(persons[1], 'nested note')
+        index = PedigreeIndex.from_sgraph(graph)
+        path = str(tmp_path / f'{seed}.bin')
+        write_index_cache(index, path)
+        assert index_summary(load_index_cache(path)) == index_summary(index)
+
+    empty = PedigreeIndex.from_parents([], [], [])
+    write_index_cache(empty, str(tmp_path / 'empty.bin'))
+    assert index_summary(load_index_cache(str(tmp_path / 'empty.bin'))) == index_summary(empty)
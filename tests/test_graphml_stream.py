@@ -0,0 +1,26 @@
+import io
+
+from sgraph.converters.graphml import graphml_to_sgraph, sgraph_to_graphml_file
+
+from graphml_stream import graphml_file_to_sgraph
+from pedigree_index import PedigreeIndex
+from synthetic import generate_pedigree
+
+
+def index_summary(index):
+    return (list(index.names), [list(index.parents(i)) for i in range(len(index))],
+            list(index.attrs), index.nested)
+
+
+def test_streaming_reads_the_same_graph(tmp_path):
+    for seed in range(3):
+        path = str(tmp_path / 'pedigree.graphml')
+        sgraph_to_graphml_file(generate_pedigree(300, seed, descriptions=0.2), path)
+        with open(path, encoding='utf-8') as f:
+            expected = PedigreeIndex.from_sgraph(graphml_to_sgraph(f.read()))
+        assert index_summary(PedigreeIndex.from_sgraph(graphml_file_to_sgraph(path))) == \
+            index_summary(expected)
+        with open(path, 'rb') as f:
+            stream = io.BytesIO(f.read())
+        assert index_summary(PedigreeIndex.from_sgraph(graphml_file_to_sgraph(stream))) == \
+            index_summary(expected)
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import pickle
+import random
+
+from duplicates import duplicate_blocks
+from except_utils import collecting_issues
+from incremental import find_changed_persons, find_renamed_ids, verify_graph_incremental
+from pedigree_index import PedigreeIndex
+from verifier import verify_graph
+
+FIRST_NAMES = ['Matti', 'Maija', 'Juho', 'Liisa', 'Anna']
+
+
+def random_pedigree(seed, n=60):
+    rnd = random.Random(seed)
+    names = []
+    parents = []
+    for i in range(n):
+        names.append(f'{rnd.choice(FIRST_NAMES)} Aho {1700 + i + rnd.randint(0, 3)} x{i}')
+        parents.append(rnd.sample(range(max(0, i - 10), i), min(rnd.randint(0, 2), i)))
+    return names, parents
+
+
+def issues_of(check, *args):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()), \
+            collecting_issues() as collector:
+        check(*args)
+    return {(issue.check, issue.message) for issue in collector.issues}
+
+
+def test_rename_in_place_finds_the_new_issues():
+    for seed in range(20):
+        names, parents = random_pedigree(seed)
+        previous = PedigreeIndex.from_parents(list(names), [{} for _ in names], parents)
+        before = issues_of(verify_graph, previous)
+        previous = pickle.loads(pickle.dumps(previous))
+
+        rnd = random.Random(seed)
+        renamed = rnd.randrange(len(names))
+        names[renamed] = names[renamed].replace('Aho', 'Niemi')
+        child = rnd.randrange(1, len(names))
+        parents[child] = [rnd.randrange(child)]
+        index = PedigreeIndex.from_parents(list(names), [{} for _ in names], parents)
+        assert find_renamed_ids(previous, index) == [renamed]
+
+        found = issues_of(verify_graph_incremental, previous, index)
+        full = PedigreeIndex.from_parents(list(names), [{} for _ in names], parents)
+        # The components of the whole graph are not rechecked incrementally
+        after = {issue for issue in issues_of(verify_graph, full)
+                 if issue[0] != 'verify_components'}
+        assert after - before <= found <= after
+        # The lookups carried over are the ones a full run builds
+        assert index.sorted_names() == full.sorted_names()
+        assert {key: sorted(ids) for key, ids in duplicate_blocks(index)[0].items()} == \
+            duplicate_blocks(full)[0]
+
+
+def test_changed_in_place_includes_old_and_new_parents():
+    names, parents = random_pedigree(0, 10)
+    previous = PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+    parents = list(parents)
+    old_parents = parents[9]
+    parents[9] = [0]
+    index = PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+    changed = find_changed_persons(previous, index, find_renamed_ids(previous, index))
+    assert changed == {9, 0, *old_parents}
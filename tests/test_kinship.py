@@ -0,0 +1,34 @@
+import random
+
+from ancestry import AncestorIndex
+from kinship import KinshipIndex
+from pedigree_index import PedigreeIndex
+
+
+def random_index(seed, n=60):
+    rnd = random.Random(seed)
+    parents = [rnd.sample(range(i), min(i, rnd.randint(0, 2))) for i in range(n)]
+    names = [f'P{i}' for i in range(n)]
+    return PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+
+
+def test_nearest_common_ancestors_match_ancestor_index():
+    for seed in range(40):
+        index = random_index(seed)
+        ancestry = AncestorIndex(index, 60)
+        rnd = random.Random(seed)
+        pairs = [(rnd.randrange(len(index)), rnd.randrange(len(index))) for _ in range(100)]
+        expected = [ancestry.nearest_common_ancestors(a, b) for a, b in pairs]
+        assert [KinshipIndex(index).relate(a, b).common_ancestors for a, b in pairs] == expected
+        assert [r.common_ancestors for r in KinshipIndex(index).relate_many(pairs)] == expected
+
+
+def test_direct_line_ancestor_tied_with_shared_parent():
+    # 1 is a child of 0 and the grandparent of 3, whose other parent is 0: 1 and 3 share the
+    # parent 0 two links apart, and 1 is also 3's ancestor two links up
+    index = PedigreeIndex.from_parents([f'P{i}' for i in range(4)], [{} for _ in range(4)],
+                                       [[], [0], [1], [2, 0]])
+    assert KinshipIndex(index).relate(1, 3).common_ancestors == [(0, 1, 1), (1, 0, 2)]
+    kinship = KinshipIndex(index)
+    kinship.ancestors(3)
+    assert kinship.relate(1, 3).common_ancestors == [(0, 1, 1), (1, 0, 2)]
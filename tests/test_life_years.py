@@ -0,0 +1,28 @@
+import contextlib
+import io
+
+from except_utils import collecting_issues
+from incremental import verify_graph_incremental
+from pedigree_index import PedigreeIndex
+from verifier import verify_graph
+
+
+def parent_without_year_in_name():
+    return PedigreeIndex.from_parents(['Anna Aho', 'Liisa Aho 1702'],
+                                      [{'year_of_birth': '1700'}, {}], [[], [0]])
+
+
+def birth_year_messages(verify):
+    index = parent_without_year_in_name()
+    with contextlib.redirect_stdout(io.StringIO()), collecting_issues() as collector:
+        verify(index)
+    assert index.attrs == [{}, {}]
+    return [issue.message for issue in collector.issues
+            if issue.check == 'verify_birth_years']
+
+
+def test_year_of_birth_is_used_in_full_and_incremental_runs():
+    expected = ['Parent too young: Liisa Aho 1702 parent=Anna Aho']
+    assert birth_year_messages(verify_graph) == expected
+    empty = PedigreeIndex.from_parents([], [], [])
+    assert birth_year_messages(lambda index: verify_graph_incremental(empty, index)) == expected
@@ -0,0 +1,26 @@
+import contextlib
+import io
+
+from except_utils import collecting_issues
+from instrument import instrumenting
+from parallel_verify import verify_graph_parallel, verify_graph_sharded
+from pedigree_index import PedigreeIndex
+from verifier import verification_checks
+
+
+def small_pedigree():
+    names = ['Matti Aho 1700', 'Maija Aho 1702', 'Juho Aho 1725', 'Liisa Aho 1727',
+             'Anna Aho 1750', 'Kalle Niemi 1760']
+    parents = [[], [], [0, 1], [0, 1], [2], []]
+    return PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+
+
+def test_worker_timers_and_counters_are_merged():
+    names = [name for name, _, _ in verification_checks()]
+    for verify in (verify_graph_parallel, verify_graph_sharded):
+        with contextlib.redirect_stdout(io.StringIO()), \
+                contextlib.redirect_stderr(io.StringIO()), collecting_issues(), \
+                instrumenting() as instrumentation:
+            verify(small_pedigree(), workers=2)
+        assert set(names) <= instrumentation.timers.keys()
+        assert instrumentation.counters['edges traversed'] > 0
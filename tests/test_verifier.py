@@ -0,0 +1,60 @@
+import contextlib
+import io
+
+from except_utils import collecting_issues
+from instrument import instrumenting
+from pedigree_index import PedigreeIndex
+from verifier import find_cousin_marriages, find_if_name_startswith_someones_elses_name, \
+    find_kids_with_cousins, get_cousins, verify_graph
+
+
+def index_of(parents):
+    names = [f'P{i}' for i in range(len(parents))]
+    return PedigreeIndex.from_parents(names, [{} for _ in names], parents)
+
+
+def test_get_cousins_lists_each_cousin_once_without_the_person():
+    # 0 and 1 are the grandparents of both 4 and 5 through their children 2 and 3
+    ancestors = {4: {0, 1}}
+    descendants = {0: {4, 5}, 1: {4, 5}}
+    assert get_cousins(4, ancestors, descendants) == [5]
+
+
+def test_kids_with_cousins_reports_each_pair_once():
+    # 2 and 3 are children of 0 and 1, 4 and 5 are their children and have a child 6
+    index = index_of([[], [], [0, 1], [0, 1], [2], [3], [4, 5]])
+    with contextlib.redirect_stdout(io.StringIO()), collecting_issues() as collector:
+        find_kids_with_cousins(index)
+    assert [issue.persons for issue in collector.issues] == [[4, 5, 6]]
+    # Also when only the bigger id of the pair is checked
+    with contextlib.redirect_stdout(io.StringIO()), collecting_issues() as collector:
+        find_kids_with_cousins(index, [5])
+    assert [issue.persons for issue in collector.issues] == [[4, 5, 6]]
+
+
+def test_cousin_marriage_counts_any_path_of_the_level():
+    # 0 is the grandparent of 2 through 1 and of 4 through 3, but also a parent of 4
+    index = index_of([[], [0], [1], [0], [3, 0], [2, 4]])
+    with contextlib.redirect_stdout(io.StringIO()), collecting_issues() as collector:
+        find_cousin_marriages(index, 1)
+    assert [issue.persons for issue in collector.issues] == [[5, 2, 4, 0]]
+
+
+def test_name_prefix_scan_compares_only_neighbours():
+    # Only the names right after a prefix in sorted order are compared, not every later one
+    names = [f'Person {i:04}' for i in range(200)] + ['Person 0001 Jr']
+    index = PedigreeIndex.from_parents(names, [{} for _ in names], [[] for _ in names])
+    with contextlib.redirect_stderr(io.StringIO()), instrumenting() as instrumentation:
+        found = find_if_name_startswith_someones_elses_name(index)
+    assert len(found) == 1
+    assert instrumentation.counters['pairs compared'] == len(names)
+
+
+def test_verbose_prints_pedigree_collapse():
+    # 4 and 5 are cousins through 2 and 3, children of 0 and 1, and 6 is their child
+    index = index_of([[], [], [0, 1], [0, 1], [2], [3], [4, 5]])
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()), \
+            collecting_issues():
+        verify_graph(index, verbose=True)
+    assert 'Parents of P6 are 1. cousins, pedigree collapse' in out.getvalue()
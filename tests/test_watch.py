@@ -0,0 +1,52 @@
+import contextlib
+import io
+import json
+import random
+
+from except_utils import collecting_issues
+from gedcom import index_to_sgraph
+from graph_cache import parse_graph_file
+from pedigree_index import PedigreeIndex
+from verifier import verify_graph
+from watch import Watcher
+
+FIRST_NAMES = ['Matti', 'Maija', 'Juho', 'Liisa', 'Anna']
+
+
+def write_pedigree(path, names, parents):
+    index = PedigreeIndex.from_parents(list(names), [{} for _ in names], parents)
+    index_to_sgraph(index).to_xml(fname=path)
+
+
+def served_issues(watcher):
+    return {(issue['check'], issue['message'])
+            for issue in map(json.loads, watcher.issues.splitlines())}
+
+
+def test_incremental_run_keeps_the_issues_of_unchanged_persons(tmp_path):
+    path = str(tmp_path / 'pedigree.xml')
+    for seed in range(10):
+        rnd = random.Random(seed)
+        names = [f'{rnd.choice(FIRST_NAMES)} Aho {1700 + i + rnd.randint(0, 3)} x{i}'
+                 for i in range(80)]
+        parents = [rnd.sample(range(max(0, i - 10), i), min(rnd.randint(0, 2), i))
+                   for i in range(80)]
+        write_pedigree(path, names, parents)
+        watcher = Watcher(path)
+        watcher.run_once()
+        before = served_issues(watcher)
+
+        renamed = rnd.randrange(len(names))
+        names[renamed] = names[renamed].replace('Aho', 'Niemi')
+        write_pedigree(path, names, parents)
+        watcher.run_once()
+        found = served_issues(watcher)
+
+        with contextlib.redirect_stdout(io.StringIO()), \
+                contextlib.redirect_stderr(io.StringIO()), collecting_issues() as collector:
+            verify_graph(PedigreeIndex.from_sgraph(parse_graph_file(path)))
+        # The components of the whole graph are not rechecked incrementally
+        after = {(issue.check, issue.message) for issue in collector.issues
+                 if issue.check != 'verify_components'}
+        assert before & after <= found
+        assert after <= found